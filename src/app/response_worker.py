@@ -0,0 +1,43 @@
+import threading
+from PyQt5.QtCore import QThread, pyqtSignal
+from src.core.question_pipeline import answer_question
+
+
+class ResponseWorker(QThread):
+    """Retrieves the context of one question and streams its answer, off the UI thread.
+
+    `stream_answer(user_input, get_context_retrieval, cancel_event)` returns
+    the answer as a generator of text pieces. Each piece is sent to the UI
+    with `piece_ready` as soon as it is generated, and the images with
+    `images_ready` as soon as they are found, while the answer is generated.
+    `cancel()` stops the generation after the current token. `finished` is
+    emitted at the end, cancelled or not.
+    """
+
+    images_ready = pyqtSignal(list)
+    piece_ready = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, user_input, stream_answer, parent=None):
+        super().__init__(parent)
+        self.user_input = user_input
+        self.stream_answer = stream_answer
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            # Image search runs alongside text retrieval and generation
+            answer_question(
+                self.user_input,
+                self.stream_answer,
+                self.images_ready.emit,
+                self.piece_ready.emit,
+                self.cancel_event,
+                top_k=5,
+                image_top_k=10,
+            )
+        except Exception as e:
+            self.failed.emit(str(e))
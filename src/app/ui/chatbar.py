@@ -2,7 +2,7 @@ from PyQt5.QtWidgets import QWidget, QLineEdit, QPushButton, QHBoxLayout
 from PyQt5.QtGui import QIcon
 from PyQt5.QtCore import QSize
 
-def create_chat_bar(on_submit_callback):
+def create_chat_bar(on_submit_callback, on_stop_callback=None):
     container = QWidget()  # Wrapper widget that we will style
     container.setObjectName("chatbarContainer")
     
@@ -16,9 +16,17 @@ def create_chat_bar(on_submit_callback):
     
     input_field.returnPressed.connect(on_submit_callback)
     send_btn.clicked.connect(on_submit_callback)
+
+    # Stops the answer being generated, only shown meanwhile
+    stop_btn = QPushButton("■ Stop")
+    stop_btn.setObjectName("stopButton")
+    stop_btn.hide()
+    if on_stop_callback is not None:
+        stop_btn.clicked.connect(on_stop_callback)
     
     layout = QHBoxLayout()
     layout.addWidget(input_field)
+    layout.addWidget(stop_btn)
     layout.addWidget(send_btn)
     layout.setContentsMargins(0, 0, 0, 0)
     layout.setSpacing(5)
@@ -41,6 +49,11 @@ def create_chat_bar(on_submit_callback):
         QPushButton {
             background: transparent;
         }
+        QPushButton#stopButton {
+            color: #A52A2A;
+            font-size: 13px;
+            padding: 5px;
+        }
     """)
 
-    return container, input_field
\ No newline at end of file
+    return container, input_field, stop_btn
\ No newline at end of file
@@ -6,13 +6,19 @@ from src.app.ui.chatbar import create_chat_bar
 from src.app.ui.topbar import create_top_bar
 from src.app.ui.bubble import Bubble
 from src.app.ui.terms_dialog import TermsDialog
-from src.core.faiss_retrieval import get_image_context_retrieval, get_context_retrieval
-from src.core.local_llm import local_llm_question
-from src.core.api_llm import api_llm_question
+from src.app.response_worker import ResponseWorker
+from src.core.faiss_retrieval import get_context_retrieval
+from src.core.local_llm import local_llm_stream
+from src.core.api_llm import api_llm_stream
+from src.core.answer_cache import answer_cache
+from src.core.backend_router import BackendRouter
 import markdown2
 
+# Falls back between the LLM backends when the chosen one is slow or failing
+router = BackendRouter({"api": api_llm_stream, "local": local_llm_stream})
 
-def choose_model(user_input):
+
+def choose_model_stream(user_input, get_context_retrieval=get_context_retrieval, cancel_event=None):
     model_type = "api"
 
     if os.path.exists(".model_config"):
@@ -21,10 +27,13 @@ def choose_model(user_input):
                 if line.startswith("MODEL_TYPE="):
                     model_type = line.split("=", 1)[1].strip()
 
-    if model_type == "api":
-        return api_llm_question(user_input, get_context_retrieval)
-    else:
-        return local_llm_question(user_input, get_context_retrieval)
+    # The chosen model goes first, unless it misses its latency SLO or is down
+    def generate_stream():
+        preferred = "api" if model_type == "api" else "local"
+        return router.stream(user_input, get_context_retrieval, cancel_event, preferred=preferred)
+
+    # Near-duplicate questions are answered from the cache, without the LLM
+    return answer_cache.stream(user_input, generate_stream, cancel_event)
 
 
 
@@ -35,6 +44,7 @@ class ChatApp(QWidget):
         self.setMinimumSize(500, 600)
 
         self.llm_backend = "local"
+        self.worker = None
         self.init_ui()
         self.check_license_agreement()
 
@@ -46,7 +56,9 @@ class ChatApp(QWidget):
         self.layout.addWidget(create_top_bar("GrifftihAI"), stretch=0)
 
         # Create chatbar widget once here
-        self.chatbar_widget, self.input_field = create_chat_bar(self.send_message)
+        self.chatbar_widget, self.input_field, self.stop_button = create_chat_bar(
+            self.send_message, self.stop_response
+        )
 
         # Placeholder widget to center chatbar and label vertically
         self.placeholder_widget = QWidget()
@@ -153,6 +165,10 @@ class ChatApp(QWidget):
         if not user_input:
             return
 
+        # One answer at a time, the question stays in the input meanwhile
+        if self.worker is not None:
+            return
+
         if self.chat_area is None:
             self.setup_chat_ui()
         
@@ -164,14 +180,47 @@ class ChatApp(QWidget):
         self.typing_label.setStyleSheet("color: gray; font-style: italic; margin: 10px;")
         self.chat_area.addWidget(self.typing_label)
 
+        # Images of the question go under its answer, as soon as they are found
+        self.images_widget = QWidget()
+        self.images_layout = QVBoxLayout(self.images_widget)
+        self.images_layout.setContentsMargins(0, 0, 0, 0)
+        self.chat_area.addWidget(self.images_widget)
+
 
         self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum())
 
-        # Fetch model response and display it
-        QTimer.singleShot(100, lambda: self.fetch_and_display_response(user_input))
+        # Fetch model response and display it as it is generated
+        self.last_user_input = user_input
+        self.partial_response = ""
+        self.animated_bubble = None
+
+        self.worker = ResponseWorker(user_input, choose_model_stream, self)
+        self.worker.images_ready.connect(self.set_context_images)
+        self.worker.piece_ready.connect(self.append_bot_piece)
+        self.worker.failed.connect(self.show_response_error)
+        self.worker.finished.connect(self.finish_bot_response)
+        self.stop_button.show()
+        self.worker.start()
+
+    def stop_response(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def closeEvent(self, event):
+        # Stop the generation before the thread is destroyed
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker.wait()
+        super().closeEvent(event)
 
 
     def add_message(self, message, is_user):
+        self.chat_area.addWidget(self.message_widget(message, is_user))
+
+        # Ensure scrolling is correct
+        self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum())
+
+    def message_widget(self, message, is_user):
         bubble = Bubble(message, is_user)
         
         container = QHBoxLayout()
@@ -184,85 +233,78 @@ class ChatApp(QWidget):
 
         wrapper = QWidget()
         wrapper.setLayout(container)
-        self.chat_area.addWidget(wrapper)
-
-        # Ensure scrolling is correct
-        self.scroll.verticalScrollBar().setValue(self.scroll.verticalScrollBar().maximum())
 
         # Delay applying the max width to allow layout to finish
         QTimer.singleShot(0, lambda: bubble.setMaximumWidth(int(self.scroll.viewport().width() * 0.75)))
+        return wrapper
 
 
 
     from PyQt5.QtCore import QTimer
 
-    def fetch_and_display_response(self, user_input):
-        self.last_user_input = user_input
-        # Get the model's response
-        response = choose_model(user_input).strip()
+    def set_context_images(self, context_images):
+        # Shown on arrival, usually while the answer is still being written
+        try:
+            top_images = sorted(context_images, key=lambda x: x["distances"])[:3]
+
+            for image in top_images:
+                print("[Image retrieval]:", image["description"], image["distances"])
+
+                if image["distances"] < 0.8920:  # Seuil ajustable
+                    description = image["description"]
+                    image_path = image["image_path"]
+                    markdown = f"**Description**: {description}\n\n![Image]({image_path})"
+                    self.images_layout.addWidget(self.message_widget(markdown, is_user=False))
+
 
-        #response_dist = response["distance"]
+        except Exception as e:
+            print(f"[Image retrieval failed]: {e}")
 
+    def remove_typing_label(self):
         # Remove typing indicator if it exists
         if hasattr(self, 'typing_label') and self.typing_label:
             self.typing_label.deleteLater()
             self.typing_label = None
 
-        # Prepare for animation
-        self.partial_response = ""
-        self.char_index = 0
-        self.bot_response = response  # full markdown text
-
-        self.animated_bubble = Bubble("", is_user=False)
-        container = QHBoxLayout()
-        container.addWidget(self.animated_bubble)
-        container.addStretch()
-        wrapper = QWidget()
-        wrapper.setLayout(container)
-        self.chat_area.addWidget(wrapper)
-
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.animate_bot_typing)
-        self.timer.start(30)
-
-
-
-    def animate_bot_typing(self):
-        if self.char_index < len(self.bot_response):
-            # Accumulate response progressively
-            self.partial_response += self.bot_response[self.char_index]
-            self.char_index += 1
-
-            # Convert markdown to HTML
-            html = markdown2.markdown(self.partial_response)
-            self.animated_bubble.setText(html)
+    def append_bot_piece(self, piece):
+        if self.animated_bubble is None:
+            # First piece of the answer
+            self.remove_typing_label()
 
-            # Scroll to the bottom
-            self.scroll.verticalScrollBar().setValue(
-                self.scroll.verticalScrollBar().maximum()
-            )
-
-        else:
-            # Typing done: stop timer
-            self.timer.stop()
-            self.timer.deleteLater()
-            self.timer = None
-
-            try:
-                # ✅ Only now call image retrieval ONCE
-                context_images, *_ = get_image_context_retrieval(self.last_user_input, top_k=10)
-
-                top_images = sorted(context_images, key=lambda x: x["distances"])[:3]
-
-                for image in top_images:
-                    print("[Image retrieval]:", image["description"], image["distances"])
-
-                    if image["distances"] < 0.8920:  # Seuil ajustable
-                        description = image["description"]
-                        image_path = image["image_path"]
-                        markdown = f"**Description**: {description}\n\n![Image]({image_path})"
-                        self.add_message(markdown, is_user=False)
-
-
-            except Exception as e:
-                print(f"[Image retrieval failed]: {e}")
+            self.animated_bubble = Bubble("", is_user=False)
+            container = QHBoxLayout()
+            container.addWidget(self.animated_bubble)
+            container.addStretch()
+            wrapper = QWidget()
+            wrapper.setLayout(container)
+            # Above the images, which may already be shown
+            self.chat_area.insertWidget(self.chat_area.indexOf(self.images_widget), wrapper)
+
+        # Accumulate response progressively
+        self.partial_response += piece
+
+        # Convert markdown to HTML
+        html = markdown2.markdown(self.partial_response.strip())
+        self.animated_bubble.setText(html)
+
+        # Scroll to the bottom
+        self.scroll.verticalScrollBar().setValue(
+            self.scroll.verticalScrollBar().maximum()
+        )
+
+    def show_response_error(self, message):
+        print(f"[Answer generation failed]: {message}")
+        self.remove_typing_label()
+        self.add_message("Sorry, something went wrong while answering.", is_user=False)
+
+    def finish_bot_response(self):
+        # Typing done: hide the stop button
+        self.stop_button.hide()
+        self.remove_typing_label()
+        self.worker.deleteLater()
+        self.worker = None
+
+        # No image under an answer that was never written
+        if self.animated_bubble is None:
+            self.images_widget.deleteLater()
+            self.images_widget = None
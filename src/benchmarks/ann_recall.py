@@ -0,0 +1,110 @@
+import json
+import time
+import numpy as np
+from sentence_transformers import SentenceTransformer
+import src.config as config
+from src.core.faiss_index import (
+    apply_search_params,
+    build_index,
+    has_exact_distances,
+    index_size,
+    rescore,
+)
+
+TOP_K = 5
+NUM_QUERIES = 200
+
+# (index type, search parameters) pairs compared against the flat baseline
+SETTINGS = [
+    ("flat", {}),
+    ("hnsw", {"ef_search": 16}),
+    ("hnsw", {"ef_search": 64}),
+    ("hnsw", {"ef_search": 256}),
+    ("ivf_flat", {"nprobe": 1}),
+    ("ivf_flat", {"nprobe": 8}),
+    ("ivf_flat", {"nprobe": 32}),
+    ("ivf_pq", {"nprobe": 8}),
+    ("ivf_pq", {"nprobe": 32}),
+    ("sq8", {}),
+    ("fp16", {}),
+    ("binary", {}),
+]
+
+
+def first_sentence(text):
+    # A partial chunk makes a query that is close to, but not the same as, its chunk
+    return text.split(". ")[0][:300]
+
+
+def search_one_by_one(index, queries, top_k, vectors):
+    """Search like the app does, one question at a time, and time each search.
+
+    Indexes with compressed distances are re-scored against `vectors`, the
+    float16 store `init_rag_db` writes, so the latency includes that pass.
+    """
+    exact = has_exact_distances(index)
+    found = np.empty((len(queries), top_k), dtype="int64")
+    latencies = []
+    for i, query in enumerate(queries):
+        query = query.reshape(1, -1)
+        start_time = time.perf_counter()
+        if exact:
+            _, indices = index.search(query, top_k)
+        else:
+            _, candidates = index.search(query, top_k * config.RESCORE_FACTOR)
+            _, indices = rescore(query, candidates, vectors, top_k)
+        latencies.append(time.perf_counter() - start_time)
+        found[i] = indices[0]
+    return found, np.array(latencies)
+
+
+def recall_at_k(found, truth):
+    hits = [len(set(row) & set(expected)) for row, expected in zip(found, truth)]
+    return float(np.mean(hits)) / truth.shape[1]
+
+
+if __name__ == "__main__":
+    with open(config.RECORDS_FILE, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    print(f"✅ Loaded {len(records)} records from '{config.RECORDS_FILE}'")
+
+    model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+    texts = [record["chunk_text"] for record in records]
+    embeddings = np.array(model.encode(texts, show_progress_bar=True)).astype("float32")
+
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(texts), size=min(NUM_QUERIES, len(texts)), replace=False)
+    queries = np.array(model.encode([first_sentence(texts[i]) for i in rows])).astype(
+        "float32"
+    )
+
+    indexes = {}
+    build_times = {}
+    for index_type, _ in SETTINGS:
+        if index_type not in indexes:
+            start_time = time.perf_counter()
+            indexes[index_type] = build_index(embeddings, index_type)
+            build_times[index_type] = time.perf_counter() - start_time
+
+    vectors = embeddings.astype("float16")
+    truth, _ = search_one_by_one(indexes["flat"], queries, TOP_K, vectors)
+
+    print(
+        f"\n📊 recall@{TOP_K} against the flat index, {len(queries)} queries, "
+        f"{len(embeddings)} vectors\n"
+    )
+    print(
+        f"{'index':<10} {'params':<16} {'recall':>7} {'mean ms':>8} {'p95 ms':>8} "
+        f"{'size MB':>8} {'build s':>8}"
+    )
+    for index_type, params in SETTINGS:
+        index = indexes[index_type]
+        apply_search_params(index, **params)
+        found, latencies = search_one_by_one(index, queries, TOP_K, vectors)
+        size_mb = index_size(index) / 1e6
+        label = ",".join(f"{name}={value}" for name, value in params.items()) or "-"
+        print(
+            f"{index_type:<10} {label:<16} {recall_at_k(found, truth):>7.3f} "
+            f"{latencies.mean() * 1000:>8.3f} {np.percentile(latencies, 95) * 1000:>8.3f} "
+            f"{size_mb:>8.2f} {build_times[index_type]:>8.2f}"
+        )
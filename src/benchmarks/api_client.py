@@ -0,0 +1,89 @@
+import time
+import asyncio
+import numpy as np
+from src.benchmarks.stub_api_server import StubSettings, start_stub_server
+from src.core.async_api import AsyncInferenceClient
+
+NUM_REQUESTS = 200
+CONCURRENCY = 10
+MESSAGES = [{"role": "user", "content": "Who built Griffith College?"}]
+
+
+async def run_load(client, num_requests, concurrency):
+    """Stream `num_requests` answers, `concurrency` at a time.
+
+    Returns the time to first chunk of each answered request, and the
+    number of failed ones.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def request():
+        async with semaphore:
+            start_time = time.perf_counter()
+            first_chunk_time = None
+            try:
+                async for _ in client.stream_chat_completion(MESSAGES, model="stub"):
+                    if first_chunk_time is None:
+                        first_chunk_time = time.perf_counter() - start_time
+            except Exception:
+                return None
+            return first_chunk_time
+
+    results = await asyncio.gather(*(request() for _ in range(num_requests)))
+    latencies = [latency for latency in results if latency is not None]
+    return latencies, len(results) - len(latencies)
+
+
+async def scenario(label, stub_options, client_options, num_requests=NUM_REQUESTS):
+    settings = StubSettings(**stub_options)
+    server, base_url = start_stub_server(settings=settings)
+    client = AsyncInferenceClient(base_url=base_url, api_key="stub", **client_options)
+    try:
+        start_time = time.perf_counter()
+        latencies, failed = await run_load(client, num_requests, CONCURRENCY)
+        wall_time = time.perf_counter() - start_time
+    finally:
+        await client.aclose()
+        server.shutdown()
+        server.server_close()
+
+    latencies = np.array(latencies or [np.nan]) * 1000
+    stats = client.stats()
+    print(
+        f"{label:<31} {num_requests - failed:>4}/{num_requests:<4} "
+        f"{np.percentile(latencies, 50):>7.0f} {np.percentile(latencies, 99):>7.0f} "
+        f"{num_requests / wall_time:>7.1f} {settings.connections:>6} "
+        f"{stats['retries']:>7} {stats['hedges']:>6}"
+    )
+
+
+async def main():
+    print(
+        f"\n📊 {NUM_REQUESTS} streamed requests to the stub API, "
+        f"{CONCURRENCY} at a time\n"
+    )
+    print(
+        f"{'scenario':<31} {'answered':>9} {'p50 ms':>7} {'p99 ms':>7} "
+        f"{'req/s':>7} {'conns':>6} {'retries':>7} {'hedges':>6}"
+    )
+    no_retry = {"max_retries": 0, "hedge_percentile": 0}
+    retry = {"max_retries": 3, "backoff": 0.05, "hedge_percentile": 0}
+    hedge = {"max_retries": 3, "backoff": 0.05, "hedge_percentile": 90}
+
+    await scenario("healthy, pooled", {}, no_retry)
+    await scenario("20% 429/503, no retries", {"error_rate": 0.2}, no_retry)
+    await scenario("20% 429/503, retries", {"error_rate": 0.2}, retry)
+    slow_tail = {"slow_rate": 0.05, "slow_latency": 1.0}
+    await scenario("5% slow (1 s), retries", slow_tail, retry)
+    await scenario("5% slow (1 s), hedged p90", slow_tail, hedge)
+    # Every answer is too slow, each request fails at its deadline
+    await scenario(
+        "all slow (5 s), 0.5 s deadline",
+        {"latency": 5.0},
+        {**retry, "timeout": 0.5},
+        num_requests=CONCURRENCY,
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import time
+import random
+import numpy as np
+from src.core.backend_router import BackendRouter
+
+# Simulated seconds to the first piece; the API degrades, then goes down
+PHASES = [
+    ("api healthy", 60, {"api": 0.02, "local": 0.08, "api_errors": 0.0}),
+    ("api slow", 60, {"api": 0.3, "local": 0.08, "api_errors": 0.0}),
+    ("api down", 60, {"api": 0.01, "local": 0.08, "api_errors": 1.0}),
+    ("api back", 60, {"api": 0.02, "local": 0.08, "api_errors": 0.0}),
+]
+LATENCY_SLO = 0.1
+
+
+def simulated_backends(phase):
+    def api(user_input, get_context_retrieval, cancel_event=None):
+        time.sleep(random.expovariate(1 / phase["api"]))
+        if random.random() < phase["api_errors"]:
+            raise ConnectionError("Inference API unavailable")
+        yield "answer"
+
+    def local(user_input, get_context_retrieval, cancel_event=None):
+        time.sleep(phase["local"])
+        yield "answer"
+
+    return {"api": api, "local": local}
+
+
+def run(router_enabled):
+    """Ask every phase's questions, return per phase (answered, within SLO, p95)."""
+    phase = {}
+    backends = simulated_backends(phase)
+    router = BackendRouter(backends, latency_slo=LATENCY_SLO, enabled=router_enabled)
+    for health in router.health.values():
+        health.cooldown = 1.0
+
+    results = []
+    for label, questions, settings in PHASES:
+        phase.update(settings)
+        latencies, failed = [], 0
+        for _ in range(questions):
+            start_time = time.perf_counter()
+            try:
+                router.question("Who built Griffith College?", None, preferred="api")
+            except ConnectionError:
+                failed += 1
+                continue
+            latencies.append(time.perf_counter() - start_time)
+        latencies = np.array(latencies or [np.nan])
+        results.append(
+            (
+                label,
+                questions - failed,
+                questions,
+                np.mean(latencies <= LATENCY_SLO),
+                np.percentile(latencies, 95),
+            )
+        )
+    return results, router.metrics()
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    print(f"\n📊 Simulated backends, latency SLO {LATENCY_SLO * 1000:.0f} ms\n")
+    print(f"{'routing':<10} {'phase':<12} {'answered':>9} {'in SLO':>7} {'p95 ms':>7}")
+    for label, enabled in (("api only", False), ("router", True)):
+        results, metrics = run(enabled)
+        for phase, answered, questions, in_slo, p95 in results:
+            print(
+                f"{label:<10} {phase:<12} {answered:>4}/{questions:<4} "
+                f"{in_slo:>7.0%} {p95 * 1000:>7.0f}"
+            )
+    print(f"\n📈 Router metrics: {metrics}")
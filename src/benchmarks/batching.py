@@ -0,0 +1,71 @@
+import sys
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import src.config as config
+from src.core.backends import registry
+from src.core.batch_scheduler import BatchScheduler
+from src.benchmarks.sample_questions import chat_prompts, sample_questions
+from src.core.local_llm import encode, generate_batch
+
+NUM_REQUESTS = 32
+CONCURRENCY = 8
+CONTEXT_CHUNKS = 3
+MAX_NEW_TOKENS = 64
+
+
+def run_load(scheduler, prompts, concurrency):
+    """Send `prompts` from `concurrency` simulated users at once.
+
+    Returns the wall time, the latency of each request and the answers.
+    """
+
+    def request(prompt):
+        start_time = time.perf_counter()
+        answer = scheduler.generate(prompt)
+        return time.perf_counter() - start_time, answer
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(request, prompts))
+    wall_time = time.perf_counter() - start_time
+    return wall_time, [latency for latency, _ in results], [a for _, a in results]
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.benchmarks.batching [max_batch_size] [concurrency]
+    max_batch_size = (
+        int(sys.argv[1]) if len(sys.argv) > 1 else config.LOCAL_MAX_BATCH_SIZE
+    )
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else CONCURRENCY
+
+    pipe = registry.get("local_pipeline")
+    tokenizer = pipe.tokenizer
+
+    # Questions made from chunk starts, with random chunks as context
+    prompts = chat_prompts(tokenizer, sample_questions(NUM_REQUESTS, CONTEXT_CHUNKS))
+
+    generate = partial(generate_batch, max_new_tokens=MAX_NEW_TOKENS)
+    # Warm up
+    generate(prompts[:2])
+
+    print(
+        f"\n📊 {NUM_REQUESTS} requests from {concurrency} concurrent users, "
+        f"up to {MAX_NEW_TOKENS} new tokens each\n"
+    )
+    print(
+        f"{'batch size':<11} {'mean batch':>10} {'req/s':>7} {'tokens/s':>9} "
+        f"{'p50 s':>7} {'p95 s':>7}"
+    )
+    for batch_size in sorted({1, max_batch_size}):
+        scheduler = BatchScheduler(
+            generate, max_batch_size=batch_size, max_wait=config.LOCAL_BATCH_MAX_WAIT
+        )
+        wall_time, latencies, answers = run_load(scheduler, prompts, concurrency)
+        tokens = sum(len(encode(tokenizer, answer)) for answer in answers)
+        print(
+            f"{batch_size:<11} {scheduler.stats()['mean_batch_size']:>10.1f} "
+            f"{NUM_REQUESTS / wall_time:>7.2f} {tokens / wall_time:>9.1f} "
+            f"{np.percentile(latencies, 50):>7.2f} {np.percentile(latencies, 95):>7.2f}"
+        )
@@ -0,0 +1,77 @@
+import sys
+import time
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import src.config as config
+from src.core.cpu_profile import load_cpu_model
+from src.benchmarks.sample_questions import chat_prompts, sample_questions
+from src.core.local_llm import encode
+
+NUM_QUESTIONS = 4
+CONTEXT_CHUNKS = 3
+NEW_TOKENS = 64
+
+
+def tokens_per_second(model, tokenizer, prompts):
+    """Generate exactly NEW_TOKENS greedy tokens per prompt, return tokens/s."""
+    times = []
+    for prompt in prompts:
+        input_ids = torch.tensor([encode(tokenizer, prompt)])
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                pad_token_id=tokenizer.eos_token_id,
+                do_sample=False,
+                max_new_tokens=NEW_TOKENS,
+                min_new_tokens=NEW_TOKENS,
+            )
+        times.append(time.perf_counter() - start_time)
+    return NEW_TOKENS * len(prompts) / sum(times)
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.benchmarks.cpu_profile [model] [--compile]
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    model_name = args[0] if args else config.LOCAL_MODEL
+
+    # Questions made from chunk starts, with random chunks as context
+    questions = sample_questions(NUM_QUESTIONS + 1, CONTEXT_CHUNKS)
+
+    profiles = [
+        ("auto (bf16)", None),
+        ("cpu fp32", {"quantize": False, "compile_model": False}),
+        ("cpu int8", {"quantize": True, "compile_model": False}),
+    ]
+    if "--compile" in sys.argv:
+        profiles.append(
+            ("cpu int8 + compile", {"quantize": True, "compile_model": True})
+        )
+
+    print(
+        f"🔄 Benchmarking '{model_name}' on CPU ({torch.get_num_threads()} threads)..."
+    )
+    results = []
+    for label, options in profiles:
+        if options is None:
+            # The "auto" profile, as load_pipeline loads it on a host without GPU
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModelForCausalLM.from_pretrained(
+                model_name, torch_dtype=torch.bfloat16
+            ).eval()
+        else:
+            model, tokenizer = load_cpu_model(model_name, **options)
+
+        prompts = chat_prompts(tokenizer, questions)
+
+        # Warm up (and compile) on the first prompt
+        tokens_per_second(model, tokenizer, prompts[:1])
+        results.append((label, tokens_per_second(model, tokenizer, prompts[1:])))
+        del model
+
+    print(f"\n📊 Greedy generation of {NEW_TOKENS} tokens, {NUM_QUESTIONS} prompts\n")
+    print(f"{'profile':<20} {'tokens/s':>9} {'speedup':>8}")
+    baseline = results[0][1]
+    for label, speed in results:
+        print(f"{label:<20} {speed:>9.1f} {speed / baseline:>7.2f}x")
@@ -0,0 +1,88 @@
+import re
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+import src.config as config
+from src.core.faiss_index import read_index
+
+NUM_WORKERS = 4
+
+
+def memory_usage():
+    """Return the RSS split and the PSS of this process, in MB.
+
+    PSS divides each shared page between the processes mapping it, so it
+    shows how much a worker really costs once pages are shared.
+    """
+    usage = {}
+    with open("/proc/self/status", "r") as f:
+        status = f.read()
+    for field in ("VmRSS", "RssAnon", "RssFile"):
+        usage[field] = int(re.search(rf"{field}:\s+(\d+)", status).group(1)) / 1024
+    with open("/proc/self/smaps_rollup", "r") as f:
+        usage["Pss"] = int(re.search(r"Pss:\s+(\d+)", f.read()).group(1)) / 1024
+    return usage
+
+
+def worker(path, mmap, barrier, results):
+    baseline = memory_usage()
+
+    start_time = time.perf_counter()
+    index = read_index(path, mmap=mmap)
+    load_time = time.perf_counter() - start_time
+
+    # Touch the index like a first question does
+    query = np.random.default_rng(0).random((1, index.d), dtype="float32")
+    index.search(query, 5)
+    first_search_time = time.perf_counter() - start_time - load_time
+
+    # Measure once every worker holds the index, so shared pages count as shared
+    barrier.wait()
+    usage = memory_usage()
+    results.put(
+        {
+            "load": load_time,
+            "search": first_search_time,
+            **{field: usage[field] - baseline[field] for field in usage},
+        }
+    )
+    barrier.wait()
+
+
+def run(path, mmap, num_workers):
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(num_workers)
+    results = ctx.Queue()
+    workers = [
+        ctx.Process(target=worker, args=(path, mmap, barrier, results))
+        for _ in range(num_workers)
+    ]
+    for process in workers:
+        process.start()
+    measures = [results.get() for _ in workers]
+    for process in workers:
+        process.join()
+    return measures
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else config.INDEX_FILE
+    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_WORKERS
+
+    print(f"📊 Loading '{path}' in {num_workers} worker processes")
+    print(
+        "   (page cache is warm after the first run, drop it for a true cold start)\n"
+    )
+    print(
+        f"{'mode':<8} {'load ms':>8} {'1st search ms':>14} {'RSS MB':>8} "
+        f"{'anon MB':>8} {'file MB':>8} {'PSS MB':>8}"
+    )
+    for mmap in (False, True):
+        measures = run(path, mmap, num_workers)
+        mean = {key: np.mean([m[key] for m in measures]) for key in measures[0]}
+        print(
+            f"{'mmap' if mmap else 'read':<8} {mean['load'] * 1000:>8.1f} "
+            f"{mean['search'] * 1000:>14.2f} {mean['VmRSS']:>8.1f} "
+            f"{mean['RssAnon']:>8.1f} {mean['RssFile']:>8.1f} {mean['Pss']:>8.1f}"
+        )
@@ -0,0 +1,81 @@
+import sys
+import time
+import numpy as np
+import torch
+from transformers import AutoModelForCausalLM, AutoTokenizer
+import src.config as config
+from src.benchmarks.sample_questions import chat_prompts, sample_questions
+from src.core.local_llm import encode, prompt_prefix_ids
+from src.core.prefix_cache import PrefixKVCache
+
+NUM_QUESTIONS = 10
+CONTEXT_CHUNKS = 5
+
+
+def prefill(model, input_ids, prefix_cache=None, prefix_ids=None):
+    """Time the prefill of a prompt, with the prefix KV cache when given.
+
+    The cached run includes the copy of the prefix cache, like a question
+    does. Returns the time and the logits of the first generated token.
+    """
+    start_time = time.perf_counter()
+    with torch.no_grad():
+        if prefix_cache is None:
+            outputs = model(input_ids=input_ids, use_cache=True)
+        else:
+            past_key_values = prefix_cache.get(prefix_ids)
+            start = len(prefix_ids)
+            outputs = model(
+                input_ids=input_ids[:, start:],
+                past_key_values=past_key_values,
+                cache_position=torch.arange(start, input_ids.shape[1]),
+                use_cache=True,
+            )
+    return time.perf_counter() - start_time, outputs.logits[0, -1].float()
+
+
+if __name__ == "__main__":
+    model_name = sys.argv[1] if len(sys.argv) > 1 else config.LOCAL_MODEL
+
+    print(f"🔄 Loading '{model_name}' on CPU ({torch.get_num_threads()} threads)...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+    model.eval()
+
+    # Questions made from chunk starts, with random chunks as context
+    prompts = chat_prompts(tokenizer, sample_questions(NUM_QUESTIONS, CONTEXT_CHUNKS))
+
+    prefix_ids = prompt_prefix_ids(tokenizer)
+    prefix_cache = PrefixKVCache(model)
+
+    # Warm up, and compute the prefix cache once like the first question does
+    warmup_ids = torch.tensor([encode(tokenizer, prompts[0])])
+    prefill(model, warmup_ids)
+    prefill(model, warmup_ids, prefix_cache, prefix_ids)
+
+    full_times, cached_times, lengths, differences = [], [], [], []
+    for prompt in prompts:
+        prompt_ids = encode(tokenizer, prompt)
+        if prompt_ids[: len(prefix_ids)] != prefix_ids:
+            print("⚠️ Prompt does not start with the cached prefix, skipped")
+            continue
+        input_ids = torch.tensor([prompt_ids])
+        full_time, full_logits = prefill(model, input_ids)
+        cached_time, cached_logits = prefill(model, input_ids, prefix_cache, prefix_ids)
+        full_times.append(full_time)
+        cached_times.append(cached_time)
+        lengths.append(input_ids.shape[1])
+        differences.append(float((full_logits - cached_logits).abs().max()))
+
+    print(
+        f"\n📊 Prefill of {len(full_times)} prompts, {np.mean(lengths):.0f} tokens on "
+        f"average, {len(prefix_ids)} of them in the cached prefix\n"
+    )
+    print(f"{'mode':<14} {'mean ms':>8} {'p95 ms':>8}")
+    for label, times in (("full prompt", full_times), ("prefix cache", cached_times)):
+        times = np.array(times) * 1000
+        print(f"{label:<14} {times.mean():>8.1f} {np.percentile(times, 95):>8.1f}")
+    print(
+        f"\n⚡ {np.mean(full_times) / np.mean(cached_times):.2f}x faster prefill, "
+        f"max logit difference {max(differences):.2e}"
+    )
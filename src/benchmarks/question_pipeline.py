@@ -0,0 +1,98 @@
+import sys
+import time
+import numpy as np
+from src.benchmarks.sample_questions import sample_questions
+from src.core.faiss_retrieval import engine
+from src.core.question_pipeline import answer_question
+
+NUM_QUESTIONS = 20
+PIECES = 20
+
+
+def synthetic_answer(seconds):
+    """Return a `stream_answer` yielding PIECES pieces over `seconds`, like an LLM."""
+
+    def stream_answer(user_input, get_context_retrieval, cancel_event=None):
+        get_context_retrieval(user_input, top_k=5)
+        for _ in range(PIECES):
+            time.sleep(seconds / PIECES)
+            yield "word "
+
+    return stream_answer
+
+
+def sequential(question, stream_answer):
+    """The stages one after the other, as the app ran them before the pipeline."""
+    queries = [question]
+    snapshot = engine.snapshot()
+    query_vecs = engine.encode_batch(queries)
+    hits_per_query, _ = engine.search_text_batch(snapshot, queries, query_vecs, 5)
+    chunks = [hit["chunk_text"] for hit in hits_per_query[0]]
+    for _ in stream_answer(
+        question, lambda query, top_k=5: (chunks, "N/A", "N/A", "N/A")
+    ):
+        pass
+    engine.search_images_batch(snapshot, queries, query_vecs, 10)
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.benchmarks.question_pipeline [generation seconds]
+    generation_seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    stream_answer = synthetic_answer(generation_seconds)
+
+    questions = [question for question, _ in sample_questions(NUM_QUESTIONS, 1)]
+
+    # Warm up, loads the encoder and the indexes
+    sequential(questions[0], stream_answer)
+
+    # Time of each stage alone, with embedding cache misses
+    engine.embedding_cache.clear()
+    stage_times = {"embedding": [], "text": [], "images": []}
+    for question in questions:
+        snapshot = engine.snapshot()
+        start_time = time.perf_counter()
+        query_vecs = engine.encode_batch([question])
+        stage_times["embedding"].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        engine.search_text_batch(snapshot, [question], query_vecs, 5)
+        stage_times["text"].append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        engine.search_images_batch(snapshot, [question], query_vecs, 10)
+        stage_times["images"].append(time.perf_counter() - start_time)
+
+    totals = {"sequential": [], "pipeline": []}
+    # Time until the images can be shown
+    images_ready = {"sequential": [], "pipeline": []}
+    for question in questions:
+        engine.embedding_cache.clear()
+        start_time = time.perf_counter()
+        sequential(question, stream_answer)
+        totals["sequential"].append(time.perf_counter() - start_time)
+        images_ready["sequential"].append(totals["sequential"][-1])
+
+        engine.embedding_cache.clear()
+        start_time = time.perf_counter()
+        answer_question(
+            question,
+            stream_answer,
+            lambda images: images_ready["pipeline"].append(
+                time.perf_counter() - start_time
+            ),
+            lambda piece: None,
+        )
+        totals["pipeline"].append(time.perf_counter() - start_time)
+
+    print(
+        f"\n📊 {NUM_QUESTIONS} questions, synthetic generation of "
+        f"{generation_seconds:.2f} seconds\n"
+    )
+    for stage, times in stage_times.items():
+        print(f"{stage + ' stage':<16} {np.mean(times) * 1000:>8.1f} ms")
+    print(f"\n{'mode':<12} {'total ms':>9} {'images ms':>10}")
+    for mode, times in totals.items():
+        print(
+            f"{mode:<12} {np.mean(times) * 1000:>9.1f} "
+            f"{np.mean(images_ready[mode]) * 1000:>10.1f}"
+        )
+    saved = np.mean(totals["sequential"]) - np.mean(totals["pipeline"])
+    print(f"\n⚡ {saved * 1000:.1f} ms saved per question")
@@ -0,0 +1,37 @@
+import json
+import numpy as np
+import src.config as config
+
+
+def sample_questions(num_questions, context_chunks, seed=0):
+    """Return `num_questions` (question, context) pairs made from the records.
+
+    Each question is made from the start of a random chunk, with that chunk
+    and `context_chunks - 1` other random ones as context. The sampling is
+    seeded, so every run of a benchmark asks the same questions.
+    """
+    with open(config.RECORDS_FILE, "r", encoding="utf-8") as f:
+        texts = [record["chunk_text"] for record in json.load(f)]
+
+    rng = np.random.default_rng(seed)
+    questions = []
+    for _ in range(num_questions):
+        rows = rng.choice(len(texts), size=context_chunks, replace=False)
+        context = "\n\n".join(texts[i] for i in rows)
+        question = f"What does this say: {texts[rows[0]].split('. ')[0][:200]}?"
+        questions.append((question, context))
+    return questions
+
+
+def chat_prompts(tokenizer, questions):
+    """Return the local LLM prompt of each (question, context) pair."""
+    from src.core.local_llm import build_messages
+
+    return [
+        tokenizer.apply_chat_template(
+            build_messages(context, question),
+            tokenize=False,
+            add_generation_prompt=True,
+        )
+        for question, context in questions
+    ]
@@ -0,0 +1,81 @@
+import sys
+import time
+import torch
+import src.config as config
+from src.core.cpu_profile import load_cpu_model
+from src.benchmarks.sample_questions import chat_prompts, sample_questions
+from src.core.local_llm import encode, generation_kwargs
+from src.core.speculative import DraftAcceptance
+
+NUM_QUESTIONS = 4
+CONTEXT_CHUNKS = 3
+MAX_NEW_TOKENS = 128
+
+
+def tokens_per_second(model, tokenizer, prompts, draft_model=None, acceptance=None):
+    """Sample an answer per prompt, assisted by `draft_model` if given, return tokens/s."""
+    new_tokens, total_time = 0, 0.0
+    for prompt in prompts:
+        input_ids = torch.tensor([encode(tokenizer, prompt)])
+        kwargs = {**generation_kwargs, "max_new_tokens": MAX_NEW_TOKENS}
+        torch.manual_seed(0)
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            if draft_model is None:
+                outputs = model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    pad_token_id=tokenizer.eos_token_id,
+                    **kwargs,
+                )
+            else:
+                with acceptance.track(model, draft_model) as calls:
+                    outputs = model.generate(
+                        input_ids=input_ids,
+                        attention_mask=torch.ones_like(input_ids),
+                        pad_token_id=tokenizer.eos_token_id,
+                        assistant_model=draft_model,
+                        **kwargs,
+                    )
+                acceptance.record(calls, outputs.shape[1] - input_ids.shape[1])
+        total_time += time.perf_counter() - start_time
+        new_tokens += outputs.shape[1] - input_ids.shape[1]
+    return new_tokens / total_time
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.benchmarks.speculative [model] [draft model]
+    model_name = sys.argv[1] if len(sys.argv) > 1 else config.LOCAL_MODEL
+    draft_name = sys.argv[2] if len(sys.argv) > 2 else config.LOCAL_DRAFT_MODEL
+    if not draft_name:
+        sys.exit("❌ Set LOCAL_DRAFT_MODEL or pass the draft model as 2nd argument")
+
+    print(f"🔄 Loading '{model_name}' and draft '{draft_name}' on CPU...")
+    model, tokenizer = load_cpu_model(model_name, quantize=False)
+    draft_model, _ = load_cpu_model(draft_name, quantize=False)
+
+    # Questions made from chunk starts, with random chunks as context
+    prompts = chat_prompts(
+        tokenizer, sample_questions(NUM_QUESTIONS + 1, CONTEXT_CHUNKS)
+    )
+
+    # Warm up both modes on the first prompt
+    tokens_per_second(model, tokenizer, prompts[:1])
+    tokens_per_second(model, tokenizer, prompts[:1], draft_model, DraftAcceptance())
+
+    acceptance = DraftAcceptance()
+    plain = tokens_per_second(model, tokenizer, prompts[1:])
+    assisted = tokens_per_second(model, tokenizer, prompts[1:], draft_model, acceptance)
+
+    print(
+        f"\n📊 Sampling up to {MAX_NEW_TOKENS} tokens, {NUM_QUESTIONS} prompts "
+        f"(temperature {generation_kwargs['temperature']}, "
+        f"top_p {generation_kwargs['top_p']})\n"
+    )
+    print(f"{'mode':<10} {'tokens/s':>9}")
+    print(f"{'plain':<10} {plain:>9.1f}")
+    print(f"{'assisted':<10} {assisted:>9.1f}")
+    print(
+        f"\n⚡ {assisted / plain:.2f}x, {acceptance.rate:.1%} of "
+        f"{acceptance.proposed} draft tokens accepted"
+    )
@@ -0,0 +1,139 @@
+import sys
+import json
+import time
+import random
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = (
+    "Griffith College stands on the site of the former Richmond Bridewell, "
+    "a prison built in the early nineteenth century, later used as barracks."
+)
+
+
+class StubSettings:
+    """Behaviour of the stub server, changed by the benchmark between runs."""
+
+    def __init__(
+        self,
+        latency=0.05,
+        slow_rate=0.0,
+        slow_latency=2.0,
+        error_rate=0.0,
+        token_delay=0.002,
+    ):
+        # Seconds before the answer starts, usually `latency`, with a slow tail
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        # Share of requests answered with a 429 or a 503
+        self.error_rate = error_rate
+        # Seconds between streamed chunks
+        self.token_delay = token_delay
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible `POST .../chat/completions`, streamed or not."""
+
+    # Keep-alive, so the client connection pool is visible in `connections`
+    protocol_version = "HTTP/1.1"
+    settings = StubSettings()
+
+    def setup(self):
+        super().setup()
+        # Small writes go out at once, as from a real API server
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.settings._lock:
+            self.settings.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        settings = self.settings
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with settings._lock:
+            settings.requests += 1
+
+        if not self.path.endswith("/chat/completions"):
+            return self.send_json(404, {"error": "Not found"})
+        if random.random() < settings.error_rate:
+            if random.random() < 0.5:
+                return self.send_json(
+                    429, {"error": "Rate limited"}, {"Retry-After": "0"}
+                )
+            return self.send_json(503, {"error": "Unavailable"})
+
+        slow = random.random() < settings.slow_rate
+        time.sleep(settings.slow_latency if slow else settings.latency)
+
+        words = [word + " " for word in ANSWER.split()]
+        if not payload.get("stream"):
+            return self.send_json(
+                200,
+                {
+                    "choices": [{"message": {"role": "assistant", "content": ANSWER}}],
+                    "usage": {"completion_tokens": len(words)},
+                },
+            )
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for word in words:
+                chunk = {"choices": [{"delta": {"content": word}}], "usage": None}
+                self.send_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                time.sleep(settings.token_delay)
+            usage = {"choices": [], "usage": {"completion_tokens": len(words)}}
+            self.send_chunk(f"data: {json.dumps(usage)}\n\n".encode())
+            self.send_chunk(b"data: [DONE]\n\n")
+            self.send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream early
+            self.close_connection = True
+
+
+def start_stub_server(port=0, settings=None):
+    """Serve the stub API from a daemon thread, return the server and its base URL."""
+    if settings is not None:
+        StubHandler.settings = settings
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    # Usage: python -m src.benchmarks.stub_api_server [port] [error rate] [slow rate]
+    # then run the app with API_BASE_URL=http://127.0.0.1:<port>/v1
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    settings = StubSettings(
+        error_rate=float(sys.argv[2]) if len(sys.argv) > 2 else 0.0,
+        slow_rate=float(sys.argv[3]) if len(sys.argv) > 3 else 0.0,
+    )
+    server, base_url = start_stub_server(port, settings)
+    print(f"🧪 Stub Inference API on {base_url}, press Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
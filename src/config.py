@@ -11,17 +11,108 @@ INDEX_DIR = os.path.join(BASE_DIR, "LOCAL_RAG")
 
 RECORDS_FILE = "data/pinecone_records.json"
 INDEX_FILE = os.path.join(INDEX_DIR, "griffith_index.faiss")
-ID_MAP_FILE = os.path.join(INDEX_DIR, "id_map.json")
-TEXT_STORE_FILE = os.path.join(INDEX_DIR, "text_store.json")
+# FAISS int ID → _id, chunk text and category (see src/core/chunk_store.py)
+TEXT_STORE_DIR = os.path.join(INDEX_DIR, "text_store")
+# float16 copy of the embeddings, used to re-score compressed indexes
+TEXT_VECTORS_FILE = os.path.join(INDEX_DIR, "text_vectors.npy")
+# BM25 inverted index over the chunk texts (see src/core/bm25.py)
+TEXT_BM25_DIR = os.path.join(INDEX_DIR, "text_bm25")
+# Record _id → FAISS id and content hash, for incremental rebuilds
+TEXT_MANIFEST_FILE = os.path.join(INDEX_DIR, "text_manifest.json")
+# One text index per category, `<code>.faiss` with names in `names.json`
+CATEGORY_INDEX_DIR = os.path.join(INDEX_DIR, "category_indexes")
 
 IMAGE_RECORDS_FILE = "data/img_chuncks.json"
 IMAGE_INDEX_FILE = os.path.join(INDEX_DIR, "griffith_image_index.faiss")
-IMAGE_ID_MAP_FILE = os.path.join(INDEX_DIR, "image_id_map.json")
-IMAGE_STORE_FILE = os.path.join(INDEX_DIR, "image_store.json")
+# FAISS int ID → image id and description
+IMAGE_STORE_DIR = os.path.join(INDEX_DIR, "image_store")
+IMAGE_VECTORS_FILE = os.path.join(INDEX_DIR, "image_vectors.npy")
+IMAGE_BM25_DIR = os.path.join(INDEX_DIR, "image_bm25")
+IMAGE_MANIFEST_FILE = os.path.join(INDEX_DIR, "image_manifest.json")
+
+# Chunk embeddings keyed by a hash of the model name and chunk text
+EMBEDDING_CACHE_DIR = os.path.join(INDEX_DIR, "embedding_cache")
+
+# Written last by `make faiss-populate`, so a new value means a complete rebuild
+GENERATION_FILE = os.path.join(INDEX_DIR, "generation")
 
 # === Embedding Model ===
 EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
 
+# === FAISS Retrieval ===
+# Seconds between two checks of the generation file for a rebuilt index
+RELOAD_CHECK_INTERVAL = float(os.getenv("RELOAD_CHECK_INTERVAL", "2.0"))
+# Number of question embeddings kept in memory, 0 disables the cache
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "1024"))
+
+# Map index files read-only instead of copying them, so worker processes on
+# one host share the page cache
+FAISS_MMAP = os.getenv("FAISS_MMAP", "false").lower() == "true"
+# Hybrid search: fuse the dense hits with BM25_TOP_K keyword hits (RRF)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+BM25_TOP_K = int(os.getenv("BM25_TOP_K", "10"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+# Local cross-encoder reranking of the text hits, over-fetching RERANK_FETCH_K
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL_NAME = os.getenv(
+    "RERANK_MODEL_NAME", "cross-encoder/ms-marco-MiniLM-L-6-v2"
+)
+RERANK_FETCH_K = int(os.getenv("RERANK_FETCH_K", "20"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "4096"))
+# Maximal marginal relevance over MMR_FETCH_K text hits: LAMBDA trades relevance
+# (1.0) for diversity (0.0), and hits with a cosine above DEDUP_THRESHOLD to an
+# already kept one are dropped
+MMR_ENABLED = os.getenv("MMR_ENABLED", "true").lower() == "true"
+MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", "20"))
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.95"))
+# Index types: flat (exact), hnsw, ivf_flat, ivf_pq, or the compressed sq8,
+# fp16 and binary (sign bits)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_IMAGE_INDEX_TYPE = os.getenv("FAISS_IMAGE_INDEX_TYPE", "flat")
+# Maximum number of vectors used to train IVF / PQ indexes
+FAISS_TRAIN_SAMPLE_SIZE = int(os.getenv("FAISS_TRAIN_SAMPLE_SIZE", "50000"))
+# IVF: number of clusters, and clusters visited per search
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "100"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "8"))
+# PQ: sub-quantizers (must divide the embedding size) and bits per code
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+FAISS_PQ_NBITS = int(os.getenv("FAISS_PQ_NBITS", "8"))
+# HNSW: links per node, and candidate list size at build and search time
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "200"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+# Indexes with compressed distances fetch RESCORE_FACTOR x top_k candidates and
+# re-rank them against the stored float vectors
+RESCORE_FACTOR = int(os.getenv("RESCORE_FACTOR", "4"))
+
+# Also build one text index per chunk category, searched instead of the
+# filtered main index when a question is restricted to categories
+FAISS_CATEGORY_INDEXES = os.getenv("FAISS_CATEGORY_INDEXES", "false").lower() == "true"
+# Streaming ingestion (`init_rag_db --stream`): records per encoded batch, and
+# CPU encoder processes (0 lets sentence-transformers use every GPU, or 4 CPUs)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "1024"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0"))
+
+# === Answer Cache ===
+# Serve the stored answer when a past question has at least this cosine similarity
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.9"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+# Seconds an answer stays valid
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+
+# === Context Packing ===
+# Token budget of the retrieved context in the prompt of each backend
+LOCAL_CONTEXT_TOKENS = int(os.getenv("LOCAL_CONTEXT_TOKENS", "1024"))
+API_CONTEXT_TOKENS = int(os.getenv("API_CONTEXT_TOKENS", "2048"))
+# Number of chunk token counts kept in memory
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))
+
+# === Question Pipeline ===
+# Threads running the image search alongside text retrieval and generation
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", "4"))
+
 # === Logging ===
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 DEBUG_LOG_FILE = os.path.join(BASE_DIR, "debug.log")
@@ -48,6 +139,51 @@ if os.path.exists(model_config_path):
 
 # === Models ===
 LOCAL_MODEL = os.getenv("LOCAL_MODEL", "meta-llama/Llama-3.2-3B-Instruct")
+# Inference profile of the local model: "auto" (bfloat16, device_map auto) or "cpu"
+LOCAL_PROFILE = os.getenv("LOCAL_PROFILE", "auto")
+# CPU profile: int8 linear layers, torch.compile, torch threads (0 = default)
+LOCAL_CPU_QUANTIZE = os.getenv("LOCAL_CPU_QUANTIZE", "true").lower() == "true"
+LOCAL_CPU_COMPILE = os.getenv("LOCAL_CPU_COMPILE", "false").lower() == "true"
+LOCAL_CPU_THREADS = int(os.getenv("LOCAL_CPU_THREADS", "0"))
+# Small model sharing the tokenizer of LOCAL_MODEL, drafting tokens for it
+# (assisted generation), e.g. "meta-llama/Llama-3.2-1B-Instruct"; empty disables it
+LOCAL_DRAFT_MODEL = os.getenv("LOCAL_DRAFT_MODEL", "")
+# Keep the KV cache of the system prompt between local questions
+LOCAL_PREFIX_CACHE = os.getenv("LOCAL_PREFIX_CACHE", "true").lower() == "true"
+# Answer concurrent local questions in batches, up to a size or a wait in seconds
+LOCAL_BATCHING = os.getenv("LOCAL_BATCHING", "false").lower() == "true"
+LOCAL_MAX_BATCH_SIZE = int(os.getenv("LOCAL_MAX_BATCH_SIZE", "8"))
+LOCAL_BATCH_MAX_WAIT = float(os.getenv("LOCAL_BATCH_MAX_WAIT", "0.05"))
+API_MODEL = os.getenv("API_MODEL", "mistralai/Mistral-Small-3.1-24B-Instruct-2503")
+
+# === Inference API Client ===
+# "async" (pooled httpx client with deadlines, retries and hedging) or "hf"
+API_CLIENT = os.getenv("API_CLIENT", "async")
+API_PROVIDER = os.getenv("API_PROVIDER", "nebius")
+# OpenAI-compatible endpoint of the async client
+API_BASE_URL = os.getenv("API_BASE_URL", "https://router.huggingface.co/v1")
+# Seconds for an answer to start (retries included), and between streamed chunks
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "30"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "30"))
+# Retries on 429, 5xx and connection errors, with a jittered exponential backoff
+API_MAX_RETRIES = int(os.getenv("API_MAX_RETRIES", "3"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.5"))
+# Send a second request when the first is slower than this latency percentile (0 disables)
+API_HEDGE_PERCENTILE = float(os.getenv("API_HEDGE_PERCENTILE", "0"))
+API_MAX_CONNECTIONS = int(os.getenv("API_MAX_CONNECTIONS", "10"))
+
+# === Backend Router ===
+# Route questions between the API and local LLMs by latency and errors; when
+# off, only the model picked in the app answers
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "false").lower() == "true"
+# Seconds to the first piece of the answer (p95) a backend should stay under
+ROUTER_LATENCY_SLO = float(os.getenv("ROUTER_LATENCY_SLO", "5"))
+# Requests kept per backend, and needed before its latency or errors count
+ROUTER_WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+ROUTER_MIN_REQUESTS = int(os.getenv("ROUTER_MIN_REQUESTS", "5"))
+# Error rate opening the circuit of a backend, and seconds before it is retried
+ROUTER_ERROR_THRESHOLD = float(os.getenv("ROUTER_ERROR_THRESHOLD", "0.5"))
+ROUTER_COOLDOWN = float(os.getenv("ROUTER_COOLDOWN", "30"))
 
 
 def setup_logging():
@@ -0,0 +1,167 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+import faiss
+import src.config as config
+from src.core.faiss_retrieval import engine
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class SemanticAnswerCache:
+    """Returns the stored answer of a past question close enough to a new one.
+
+    Past questions are kept in a small inner-product FAISS index over their
+    normalized embeddings, so the similarity is the cosine. Entries expire
+    after `ttl` seconds, the least recently used one is evicted past
+    `max_size`, and everything is dropped when the RAG index generation
+    changes, since answers were built from the old context.
+    """
+
+    def __init__(
+        self,
+        encode,
+        threshold=config.ANSWER_CACHE_THRESHOLD,
+        max_size=config.ANSWER_CACHE_SIZE,
+        ttl=config.ANSWER_CACHE_TTL,
+    ):
+        self.encode = encode
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = None
+        self._index = None
+        self._entries = OrderedDict()  # FAISS id → (question, answer, stored at)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _question_vector(self, question):
+        vector = np.array(self.encode(question), dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, ids):
+        self._index.remove_ids(np.array(ids, dtype="int64"))
+        for entry_id in ids:
+            del self._entries[entry_id]
+
+    def _check_generation(self, generation):
+        if generation != self.generation:
+            if self._entries:
+                logger.info("RAG index rebuilt, clearing the answer cache")
+            self._entries.clear()
+            self._index = None
+            self.generation = generation
+
+    def _purge_expired(self):
+        now = time.time()
+        expired = [
+            entry_id
+            for entry_id, (_, _, stored_at) in self._entries.items()
+            if now - stored_at > self.ttl
+        ]
+        if expired:
+            self._remove(expired)
+
+    def lookup(self, question, generation):
+        """Return the cached answer for `question`, or None."""
+        vector = self._question_vector(question)
+
+        with self._lock:
+            self._check_generation(generation)
+            self._purge_expired()
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            similarities, ids = self._index.search(vector, 1)
+            similarity, entry_id = float(similarities[0][0]), int(ids[0][0])
+            if entry_id == -1 or similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(entry_id)
+            cached_question, answer, _ = self._entries[entry_id]
+            self.hits += 1
+
+        logger.info(f"Answer cache hit (similarity {similarity:.3f})")
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(f"Cached question: {cached_question}")
+        return answer
+
+    def store(self, question, answer, generation):
+        vector = self._question_vector(question)
+
+        with self._lock:
+            self._check_generation(generation)
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(vector, np.array([entry_id], dtype="int64"))
+            self._entries[entry_id] = (question, answer, time.time())
+
+            if len(self._entries) > self.max_size:
+                oldest = list(self._entries)[: len(self._entries) - self.max_size]
+                self._remove(oldest)
+
+    def answer(self, question, generate):
+        """Return a cached answer, or call `generate()` and cache its answer."""
+        if not config.ANSWER_CACHE_ENABLED:
+            return generate()
+
+        generation = engine.generation
+        answer = self.lookup(question, generation)
+        if answer is None:
+            answer = generate()
+            self.store(question, answer, generation)
+        return answer
+
+    def stream(self, question, generate_stream, cancel_event=None):
+        """Like `answer`, for an answer yielded piece by piece by `generate_stream()`.
+
+        A cached answer is yielded whole. A generated one is only stored once
+        fully read and if `cancel_event` is not set, so a cut answer is never
+        served again.
+        """
+        if not config.ANSWER_CACHE_ENABLED:
+            yield from generate_stream()
+            return
+
+        generation = engine.generation
+        answer = self.lookup(question, generation)
+        if answer is not None:
+            yield answer
+            return
+
+        pieces = []
+        stream = generate_stream()
+        try:
+            for piece in stream:
+                pieces.append(piece)
+                yield piece
+        finally:
+            stream.close()
+        if cancel_event is None or not cancel_event.is_set():
+            self.store(question, "".join(pieces).strip(), generation)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Reuses the question embeddings of the retrieval engine, and its cache
+answer_cache = SemanticAnswerCache(engine.encode)
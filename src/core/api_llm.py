@@ -1,7 +1,9 @@
-from huggingface_hub import InferenceClient
 import logging
 import time
 import src.config as config
+from src.core.async_api import AsyncInferenceClient, BackgroundLoop
+from src.core.backends import registry
+from src.core.context_packer import ContextPacker
 from src.core.pinecone_retrieval import get_context_retrieval
 from src.core.question_analysis import is_about_chatbot
 
@@ -9,10 +11,25 @@ from src.core.question_analysis import is_about_chatbot
 config.setup_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize HF InferenceClient using config
-client = InferenceClient(
-    provider="nebius",
-    api_key=config.HF_API_KEY,
+
+def load_client():
+    from huggingface_hub import InferenceClient
+
+    # Initialize HF InferenceClient using config
+    return InferenceClient(
+        provider=config.API_PROVIDER,
+        api_key=config.HF_API_KEY,
+    )
+
+
+registry.register("inference_client", load_client)
+# The async client and its connection pool live on one background event loop
+registry.register("api_event_loop", BackgroundLoop)
+registry.register("async_inference_client", AsyncInferenceClient)
+
+# Keeps the retrieved context within the prompt budget of this backend
+context_packer = ContextPacker(
+    config.API_CONTEXT_TOKENS, tokenizer_name=config.API_MODEL
 )
 
 system_message = {
@@ -25,7 +42,7 @@ system_message = {
 }
 
 
-def api_llm_question(user_input: str, get_context_retrieval):
+def build_messages(user_input, get_context_retrieval):
     question_time = time.time()
     logger.info("Received a question.")
 
@@ -45,9 +62,9 @@ def api_llm_question(user_input: str, get_context_retrieval):
         context_chunks, tokens, read_units, rerank_units = get_context_retrieval(
             user_input, top_k=5
         )
-        context = "\n\n".join(context_chunks)
+        context = context_packer.pack(context_chunks)
 
-    messages = [
+    return [
         system_message,
         {
             "role": "user",
@@ -58,21 +75,109 @@ def api_llm_question(user_input: str, get_context_retrieval):
         },
     ]
 
-    # Inference API call
-    llm_start_time = time.time()
-    completion = client.chat.completions.create(
-        model="mistralai/Mistral-Small-3.1-24B-Instruct-2503",
+
+def stream_deltas(messages):
+    """Yield `(content, completion_tokens)` for each chunk of a streamed completion.
+
+    Closing the generator closes the response. The token count is only in
+    the last chunk, when the provider sends usage.
+    """
+    if config.API_CLIENT == "async":
+        loop = registry.get("api_event_loop")
+        chunks = loop.iterate(
+            registry.get("async_inference_client").stream_chat_completion(
+                messages, model=f"{config.API_MODEL}:{config.API_PROVIDER}"
+            )
+        )
+        try:
+            for chunk in chunks:
+                choices = chunk.get("choices") or [{}]
+                usage = chunk.get("usage") or {}
+                yield (
+                    (choices[0].get("delta") or {}).get("content"),
+                    usage.get("completion_tokens"),
+                )
+        finally:
+            chunks.close()
+        return
+
+    stream = registry.get("inference_client").chat.completions.create(
+        model=config.API_MODEL,
         messages=messages,
+        stream=True,
+        # The last chunk holds the number of generated tokens
+        stream_options={"include_usage": True},
     )
-    llm_end_time = time.time()
+    try:
+        for chunk in stream:
+            yield (
+                chunk.choices[0].delta.content if chunk.choices else None,
+                chunk.usage.completion_tokens if chunk.usage is not None else None,
+            )
+    finally:
+        stream.close()
+
 
-    answer = completion.choices[0].message.content.strip()
+def api_llm_stream(user_input: str, get_context_retrieval, cancel_event=None):
+    """Yield the answer in pieces of text, as the Inference API streams them.
+
+    Setting `cancel_event`, or closing the generator, closes the response,
+    so the rest of the answer is not generated for nothing.
+    """
+    messages = build_messages(user_input, get_context_retrieval)
+
+    # Inference API call
+    llm_start_time = time.time()
+    deltas = stream_deltas(messages)
+
+    first_token_time = None
+    completion_tokens = None
+    pieces = 0
+    try:
+        for content, usage_tokens in deltas:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if usage_tokens is not None:
+                completion_tokens = usage_tokens
+            if not content:
+                continue
+
+            if first_token_time is None:
+                first_token_time = time.time()
+                if config.LOG_LEVEL == "DEBUG":
+                    logger.debug(
+                        f"LLM time to first token: {first_token_time - llm_start_time:.3f} seconds"
+                    )
+            pieces += 1
+            yield content
+    finally:
+        deltas.close()
+
+    llm_end_time = time.time()
 
     # Logging
     if config.LOG_LEVEL == "DEBUG":
+        # Without usage, count one token per streamed piece
+        tokens = completion_tokens if completion_tokens is not None else pieces
+        generation_time = llm_end_time - (first_token_time or llm_start_time)
         logger.debug(
             f"LLM generation duration: {llm_end_time - llm_start_time:.3f} seconds"
+            + (
+                " (cancelled)"
+                if cancel_event is not None and cancel_event.is_set()
+                else ""
+            )
+        )
+        logger.debug(
+            f"LLM generated {tokens} tokens, "
+            f"{tokens / generation_time if generation_time > 0 else 0.0:.1f} tokens/s"
         )
+
+
+def api_llm_question(user_input: str, get_context_retrieval):
+    answer = "".join(api_llm_stream(user_input, get_context_retrieval)).strip()
+
+    if config.LOG_LEVEL == "DEBUG":
         logger.debug(f"LLM answer:\n{answer}\n")
 
     return answer
@@ -90,6 +195,8 @@ if __name__ == "__main__":
             print("👋 Goodbye! Stay curious about Griffith College.")
             break
 
-        answer = api_llm_question(user_input, get_context_retrieval)
-
-        print("\n📚 GriffithBot:", answer)
+        # Print the answer as it is streamed
+        print("\n📚 GriffithBot: ", end="", flush=True)
+        for piece in api_llm_stream(user_input, get_context_retrieval):
+            print(piece, end="", flush=True)
+        print()
@@ -0,0 +1,278 @@
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+import numpy as np
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class APIStatusError(Exception):
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"Inference API error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def retry_after_seconds(response):
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error):
+    import httpx
+
+    if isinstance(error, APIStatusError):
+        return error.status_code in RETRY_STATUSES
+    return isinstance(error, httpx.TransportError)
+
+
+async def close_result(result):
+    # A streamed attempt returns an open response
+    if hasattr(result, "aclose"):
+        await result.aclose()
+
+
+class AsyncInferenceClient:
+    """Chat completions from an OpenAI-compatible endpoint, on asyncio.
+
+    One `httpx.AsyncClient` keeps a pool of connections, reused across
+    requests. Each request has a deadline; a 429, a 5xx or a transport error
+    is retried with exponential backoff and full jitter, until the deadline
+    or `max_retries`. With `hedge_percentile`, an attempt slower than that
+    percentile of recent latencies gets a second, concurrent attempt, and
+    the first one to answer wins. A streamed request counts as answered at
+    its first chunk, after which it is neither retried nor hedged.
+    """
+
+    def __init__(
+        self,
+        base_url=config.API_BASE_URL,
+        api_key=config.HF_API_KEY,
+        timeout=config.API_TIMEOUT,
+        read_timeout=config.API_READ_TIMEOUT,
+        max_retries=config.API_MAX_RETRIES,
+        backoff=config.API_RETRY_BACKOFF,
+        hedge_percentile=config.API_HEDGE_PERCENTILE,
+        max_connections=config.API_MAX_CONNECTIONS,
+    ):
+        import httpx
+
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.hedge_percentile = hedge_percentile
+        self.latencies = deque(maxlen=200)
+        self.retries = 0
+        self.hedges = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip("/") + "/",
+            headers={"Authorization": f"Bearer {api_key}"} if api_key else {},
+            timeout=httpx.Timeout(read_timeout, connect=min(timeout, 10.0)),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    def hedge_delay(self):
+        """Return the wait before a hedged attempt, or None to not hedge."""
+        # Too few latencies for a meaningful percentile
+        if not self.hedge_percentile or len(self.latencies) < 20:
+            return None
+        return float(np.percentile(self.latencies, self.hedge_percentile))
+
+    async def _hedged(self, attempt):
+        """Run `attempt()`, and a second one if the first is slower than the hedge delay."""
+        delay = self.hedge_delay()
+        if delay is None:
+            return await attempt()
+
+        pending = {asyncio.ensure_future(attempt())}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self.hedges += 1
+                if config.LOG_LEVEL == "DEBUG":
+                    logger.debug(f"Hedging a request slower than {delay:.3f} seconds")
+                pending.add(asyncio.ensure_future(attempt()))
+
+            while True:
+                answered = [task for task in done if task.exception() is None]
+                if answered:
+                    # Both may answer at once, keep the first
+                    for task in answered[1:]:
+                        await close_result(task.result())
+                    return answered[0].result()
+                if not pending:
+                    # Every attempt failed
+                    raise next(iter(done)).exception()
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+        finally:
+            # Stop the slower attempt, and close it if it answered meanwhile
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    await close_result(await task)
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    async def _with_retries(self, attempt):
+        """Run `attempt()` through hedging, retrying it until the deadline."""
+        deadline = time.monotonic() + self.timeout
+        for retry in range(self.max_retries + 1):
+            start_time = time.monotonic()
+            try:
+                async with asyncio.timeout(deadline - start_time):
+                    result = await self._hedged(attempt)
+                self.latencies.append(time.monotonic() - start_time)
+                return result
+            except TimeoutError:
+                raise TimeoutError(
+                    f"No answer from the Inference API within {self.timeout} seconds"
+                )
+            except Exception as e:
+                if not is_retryable(e) or retry == self.max_retries:
+                    raise
+                # Full jitter, at least what the server asked for
+                wait = random.uniform(0, self.backoff * 2**retry)
+                if getattr(e, "retry_after", None):
+                    wait = max(wait, e.retry_after)
+                if time.monotonic() + wait >= deadline:
+                    raise
+                self.retries += 1
+                logger.info(f"Retrying in {wait:.2f} seconds after: {e}")
+                await asyncio.sleep(wait)
+
+    async def _post(self, payload):
+        response = await self.client.post("chat/completions", json=payload)
+        if response.status_code != 200:
+            raise APIStatusError(
+                response.status_code, response.text, retry_after_seconds(response)
+            )
+        return response.json()
+
+    async def chat_completion(self, messages, model):
+        """Return the completion of `messages` as a parsed JSON response."""
+        payload = {"model": model, "messages": messages}
+        return await self._with_retries(lambda: self._post(payload))
+
+    async def _open_stream(self, payload):
+        """Send a streamed request and read it up to its first chunk."""
+        request = self.client.build_request("POST", "chat/completions", json=payload)
+        response = await self.client.send(request, stream=True)
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise APIStatusError(
+                    response.status_code, response.text, retry_after_seconds(response)
+                )
+            stream = ServerSentEvents(response)
+            await stream.peek()
+            return stream
+        except BaseException:
+            await response.aclose()
+            raise
+
+    async def stream_chat_completion(self, messages, model):
+        """Yield the chunks of a streamed completion, as parsed JSON."""
+        payload = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "stream_options": {"include_usage": True},
+        }
+        stream = await self._with_retries(lambda: self._open_stream(payload))
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self):
+        return {
+            "requests": len(self.latencies),
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_delay": self.hedge_delay(),
+        }
+
+
+class ServerSentEvents:
+    """The `data:` events of a streamed response, as parsed JSON, up to `[DONE]`."""
+
+    def __init__(self, response):
+        self.response = response
+        self.lines = response.aiter_lines()
+        self.peeked = []
+
+    async def peek(self):
+        """Read the first event ahead, so a failure shows before anything is used."""
+        try:
+            self.peeked.append(await self.__anext__())
+        except StopAsyncIteration:
+            pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.peeked:
+            return self.peeked.pop()
+        async for line in self.lines:
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:") :].strip()
+            # Read on to the end of the response, so its connection is reused
+            if data == "[DONE]":
+                continue
+            return json.loads(data)
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        await self.response.aclose()
+
+
+class BackgroundLoop:
+    """An asyncio event loop in a daemon thread, for synchronous callers.
+
+    The async client and its connection pool live on this one loop, so
+    requests from any thread reuse the same connections.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def iterate(self, async_iterator):
+        """Iterate an async generator from synchronous code."""
+        try:
+            while True:
+                try:
+                    yield self.run(async_iterator.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            self.run(async_iterator.aclose())
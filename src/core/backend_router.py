@@ -0,0 +1,202 @@
+import time
+import logging
+import threading
+from collections import deque
+import numpy as np
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class BackendHealth:
+    """Rolling latency and errors of one backend, with a circuit breaker.
+
+    Latency is the time to the first piece of the answer, what the user
+    waits for. The circuit opens when the error rate of the last `window`
+    requests reaches `error_threshold`; after `cooldown` seconds it is half
+    open, and the next request through it closes it again or reopens it.
+    """
+
+    def __init__(
+        self,
+        window=config.ROUTER_WINDOW,
+        min_requests=config.ROUTER_MIN_REQUESTS,
+        error_threshold=config.ROUTER_ERROR_THRESHOLD,
+        cooldown=config.ROUTER_COOLDOWN,
+    ):
+        self.min_requests = min_requests
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.opened_at = None
+        self.last_request = time.monotonic()
+
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def latency(self, percentile):
+        if len(self.latencies) < self.min_requests:
+            return None
+        return round(float(np.percentile(self.latencies, percentile)), 3)
+
+    def is_fast(self, latency_slo):
+        """Whether the p95 latency meets the SLO, or is due to be measured again."""
+        p95 = self.latency(95)
+        if p95 is None or p95 <= latency_slo:
+            return True
+        # A slow backend gets no requests, probe it once per cooldown
+        return time.monotonic() - self.last_request >= self.cooldown
+
+    def record(self, latency, ok):
+        self.requests += 1
+        self.last_request = time.monotonic()
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+        else:
+            self.errors += 1
+
+        if self.opened_at is not None:
+            # A request through an open circuit decides, e.g. the half-open trial
+            if ok:
+                self.opened_at = None
+                self.outcomes.clear()
+            else:
+                self.opened_at = time.monotonic()
+        elif (
+            self.opened_at is None
+            and len(self.outcomes) >= self.min_requests
+            and self.error_rate() >= self.error_threshold
+        ):
+            self.opened_at = time.monotonic()
+
+
+class BackendRouter:
+    """Routes each question to an LLM backend by latency SLO and health.
+
+    `backends` maps a name to a stream function, called as
+    `stream(user_input, get_context_retrieval, cancel_event)`. The preferred
+    backend is used while its circuit is closed and its p95 time to first
+    piece is within `latency_slo` seconds; otherwise another backend meeting
+    the SLO goes first, then the fastest of the rest. A backend failing
+    before its first piece falls back to the next one; once part of an
+    answer was shown, its error is raised instead. Backends with an open
+    circuit are only tried last, when every other one failed.
+    """
+
+    def __init__(
+        self,
+        backends,
+        latency_slo=config.ROUTER_LATENCY_SLO,
+        enabled=config.ROUTER_ENABLED,
+    ):
+        self.backends = backends
+        self.latency_slo = latency_slo
+        self.enabled = enabled
+        self.health = {name: BackendHealth() for name in backends}
+        self._lock = threading.Lock()
+
+    def order(self, preferred=None):
+        """Return the backend names in the order to try them."""
+        names = list(self.backends)
+        if preferred in names:
+            names.remove(preferred)
+            names.insert(0, preferred)
+        if not self.enabled:
+            return names[:1]
+
+        with self._lock:
+            available = [name for name in names if self.health[name].state() != "open"]
+            open_circuits = [name for name in names if name not in available]
+
+            fast = [
+                name
+                for name in available
+                if self.health[name].is_fast(self.latency_slo)
+            ]
+            slow = sorted(
+                (name for name in available if name not in fast),
+                key=lambda name: self.health[name].latency(95),
+            )
+        return fast + slow + open_circuits
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            self.health[name].record(latency, ok)
+            state = self.health[name].state()
+        if not ok:
+            logger.warning(f"Backend '{name}' failed, circuit {state}")
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(f"Backend router metrics: {self.metrics()}")
+
+    def stream(
+        self, user_input, get_context_retrieval, cancel_event=None, preferred=None
+    ):
+        """Yield the answer from the first backend able to give it."""
+        error = None
+        for name in self.order(preferred):
+            start_time = time.monotonic()
+            first_piece_time = None
+            completed = False
+            error = None
+            pieces = self.backends[name](
+                user_input, get_context_retrieval, cancel_event
+            )
+            try:
+                for piece in pieces:
+                    if first_piece_time is None:
+                        first_piece_time = time.monotonic()
+                    yield piece
+                completed = True
+            except Exception as e:
+                error = e
+            finally:
+                pieces.close()
+                cancelled = cancel_event is not None and cancel_event.is_set()
+                if first_piece_time is not None:
+                    self.record(name, first_piece_time - start_time, error is None)
+                elif error is not None or (completed and not cancelled):
+                    # Failed, or answered nothing, before any piece
+                    self.record(name, time.monotonic() - start_time, error is None)
+
+            if error is None:
+                return
+            if first_piece_time is not None:
+                # Part of the answer was shown, another backend would repeat it
+                raise error
+            logger.warning(f"Backend '{name}' failed, trying the next one: {error}")
+        raise error
+
+    def question(self, user_input, get_context_retrieval, preferred=None):
+        return "".join(
+            self.stream(user_input, get_context_retrieval, preferred=preferred)
+        ).strip()
+
+    def metrics(self):
+        """Return the rolling latency, error rate and circuit state of each backend."""
+        with self._lock:
+            return {
+                name: {
+                    "requests": health.requests,
+                    "errors": health.errors,
+                    "error_rate": round(health.error_rate(), 3),
+                    "p50": health.latency(50),
+                    "p95": health.latency(95),
+                    "circuit": health.state(),
+                }
+                for name, health in self.health.items()
+            }
@@ -0,0 +1,51 @@
+import time
+import logging
+import threading
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class BackendRegistry:
+    """Builds each backend client (LLM pipeline, API clients) on first use.
+
+    Modules register a factory under a name at import, which costs nothing;
+    the client is only built by the first `get`, once per process. Startup
+    time, memory and credentials then depend on the backends actually used.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        with self._lock:
+            self._factories[name] = factory
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        if name in self._instances:
+            return self._instances[name]
+        if name not in self._factories:
+            raise KeyError(f"Unknown backend '{name}'")
+
+        # One lock per backend, so a slow model load does not block the others
+        with self._locks[name]:
+            if name not in self._instances:
+                start_time = time.time()
+                self._instances[name] = self._factories[name]()
+                logger.info(
+                    f"Backend '{name}' loaded in {time.time() - start_time:.1f} seconds"
+                )
+        return self._instances[name]
+
+    def is_loaded(self, name):
+        return name in self._instances
+
+
+# Shared registry, one client per backend and process
+registry = BackendRegistry()
@@ -0,0 +1,154 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """Groups concurrent generation requests into batches for one model.
+
+    `submit` queues a request, e.g. a prompt, and returns a Future. A worker
+    thread takes the first waiting request, then collects more for up to
+    `max_wait` seconds or until `max_batch_size` are waiting, and calls
+    `generate_batch(requests)` once for all of them. Each answer (or error)
+    goes back to the Future of its request.
+    """
+
+    def __init__(
+        self,
+        generate_batch,
+        max_batch_size=config.LOCAL_MAX_BATCH_SIZE,
+        max_wait=config.LOCAL_BATCH_MAX_WAIT,
+    ):
+        self.generate_batch = generate_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.requests = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, prompt):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+        future = Future()
+        self._queue.put((prompt, future))
+        return future
+
+    def generate(self, prompt):
+        """Return the answer to `prompt`, generated in a batch with concurrent ones."""
+        return self.submit(prompt).result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        # Drop requests whose caller gave up while waiting
+        return [
+            (prompt, future)
+            for prompt, future in batch
+            if future.set_running_or_notify_cancel()
+        ]
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            start_time = time.time()
+            try:
+                answers = self.generate_batch([prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), answer in zip(batch, answers):
+                future.set_result(answer)
+
+            if config.LOG_LEVEL == "DEBUG":
+                logger.debug(
+                    f"Generated a batch of {len(batch)} in {time.time() - start_time:.3f} seconds "
+                    f"({self.stats()})"
+                )
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class BatchStreamer:
+    """Streams the text of each row of a batched `generate` to its own queue.
+
+    Given as the `streamer` of `generate`, which calls `put` with the prompt
+    ids first, then with the new tokens of every row. The tokens of a row
+    are decoded as they come, and the new text put on `queues[row]` unless
+    it ends in a partial character. A row ends at its first `stop_ids`
+    token, or at `end()`, and then gets None on its queue.
+    """
+
+    def __init__(self, tokenizer, queues, stop_ids):
+        self.tokenizer = tokenizer
+        self.queues = queues
+        self.stop_ids = set(stop_ids)
+        self.token_ids = [[] for _ in queues]
+        self.sent = [0] * len(queues)
+        self.finished = [False] * len(queues)
+        self.prompt_seen = False
+
+    def put(self, value):
+        if not self.prompt_seen:
+            self.prompt_seen = True
+            return
+
+        # One token per row, or several per row with assisted generation
+        for row, new_ids in enumerate(value.reshape(len(self.queues), -1).tolist()):
+            if self.finished[row]:
+                continue
+            for token_id in new_ids:
+                if token_id in self.stop_ids:
+                    self._finish(row)
+                    break
+                self.token_ids[row].append(token_id)
+            else:
+                self._flush(row)
+
+    def end(self):
+        for row in range(len(self.queues)):
+            if not self.finished[row]:
+                self._finish(row)
+
+    def _flush(self, row, final=False):
+        text = self.tokenizer.decode(self.token_ids[row], skip_special_tokens=True)
+        if text.endswith("\ufffd") and not final:
+            return
+        if len(text) > self.sent[row]:
+            self.queues[row].put(text[self.sent[row] :])
+            self.sent[row] = len(text)
+
+    def _finish(self, row):
+        self._flush(row, final=True)
+        self.finished[row] = True
+        self.queues[row].put(None)
@@ -0,0 +1,125 @@
+import os
+import re
+import math
+from collections import Counter
+import numpy as np
+from src.core.chunk_store import StringColumn, save_array
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    (
+        "a an and are as at be by for from has have in is it its of on or that "
+        "the this to was were what when where which who why with how did does "
+        "do about tell me you your"
+    ).split()
+)
+
+
+def tokenize(text):
+    return [
+        token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS
+    ]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several rankings of document ids into one.
+
+    Each document scores `sum(1 / (k + rank))` over the rankings it appears
+    in, so a document found by both searches beats one found by a single one.
+    Returns `(doc_id, score)` pairs, best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, 1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored as CSR arrays.
+
+    Written by `init_rag_db` next to the FAISS index, with documents numbered
+    like the FAISS ids:
+
+        terms.bin, terms.offsets.npy   vocabulary, sorted
+        term_offsets.npy               postings of term t: [term_offsets[t], term_offsets[t + 1])
+        doc_ids.npy, term_freqs.npy    postings, document id and term count
+        doc_lengths.npy                number of tokens per document
+    """
+
+    def __init__(self, directory, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        terms = StringColumn(os.path.join(directory, "terms"))
+        self.term_rows = {terms[i]: i for i in range(len(terms))}
+
+        def load(name):
+            return np.load(os.path.join(directory, name), mmap_mode="r")
+
+        self.term_offsets = load("term_offsets.npy")
+        self.doc_ids = load("doc_ids.npy")
+        self.term_freqs = load("term_freqs.npy")
+        self.doc_lengths = np.asarray(load("doc_lengths.npy"), dtype="float32")
+        self.num_docs = len(self.doc_lengths)
+        self.avg_doc_length = float(self.doc_lengths.mean()) if self.num_docs else 0.0
+
+    @staticmethod
+    def write(directory, texts):
+        """Index `texts`, any iterable, document `i` being the i-th text."""
+        os.makedirs(directory, exist_ok=True)
+
+        postings = {}
+        doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, freq in Counter(tokens).items():
+                postings.setdefault(term, []).append((doc_id, freq))
+
+        terms = sorted(postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype="int64")
+        term_offsets[1:] = np.cumsum([len(postings[term]) for term in terms])
+        doc_ids = np.empty(term_offsets[-1], dtype="int64")
+        term_freqs = np.empty(term_offsets[-1], dtype="float32")
+        for row, term in enumerate(terms):
+            start, end = term_offsets[row], term_offsets[row + 1]
+            doc_ids[start:end], term_freqs[start:end] = zip(*postings[term])
+
+        StringColumn.write(os.path.join(directory, "terms"), terms)
+        save_array(os.path.join(directory, "term_offsets.npy"), term_offsets)
+        save_array(os.path.join(directory, "doc_ids.npy"), doc_ids)
+        save_array(os.path.join(directory, "term_freqs.npy"), term_freqs)
+        save_array(
+            os.path.join(directory, "doc_lengths.npy"),
+            np.array(doc_lengths, dtype="int32"),
+        )
+
+    def search(self, query, top_k=10, allowed=None):
+        """Return up to `top_k` `(doc_id, score)` pairs, best first.
+
+        `allowed`, a boolean mask over documents, restricts the search.
+        """
+        scores = np.zeros(self.num_docs, dtype="float32")
+        for term in set(tokenize(query)):
+            row = self.term_rows.get(term)
+            if row is None:
+                continue
+            start, end = self.term_offsets[row], self.term_offsets[row + 1]
+            doc_ids = self.doc_ids[start:end]
+            freqs = self.term_freqs[start:end]
+
+            doc_freq = end - start
+            idf = math.log(1 + (self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            norm = self.k1 * (
+                1 - self.b + self.b * self.doc_lengths[doc_ids] / self.avg_doc_length
+            )
+            scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+
+        if allowed is not None:
+            scores[~allowed] = 0.0
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k)[:top_k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in best]
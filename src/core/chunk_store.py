@@ -0,0 +1,157 @@
+import os
+import mmap
+from array import array
+import numpy as np
+
+
+def _replace_file(path, write):
+    # Readers may still map the old file, so never rewrite it in place
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def save_array(path, array):
+    _replace_file(path, lambda f: np.save(f, array))
+
+
+class StringColumn:
+    """Strings kept as one UTF-8 blob plus an offsets array, read through mmap.
+
+    String `i` is `blob[offsets[i]:offsets[i + 1]]`, so a lookup is two array
+    reads and a decode, and only the pages touched are loaded in memory.
+    """
+
+    def __init__(self, path):
+        self.offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        with open(path + ".bin", "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                self._blob = b""
+            else:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self._blob[start:end].decode("utf-8")
+
+    @staticmethod
+    def write(path, strings):
+        writer = StringColumnWriter(path)
+        for string in strings:
+            writer.append(string)
+        writer.close()
+
+
+class StringColumnWriter:
+    """Writes a `StringColumn` one string at a time.
+
+    Strings go straight to a temporary blob file, so only the offsets stay
+    in memory. The column replaces the previous one on `close()`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._blob = open(path + ".bin.tmp", "wb")
+        self._offsets = array("q", [0])
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def append(self, string):
+        data = string.encode("utf-8")
+        self._blob.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+
+    def close(self):
+        self._blob.close()
+        os.replace(self.path + ".bin.tmp", self.path + ".bin")
+        save_array(self.path + ".offsets.npy", np.frombuffer(self._offsets, "int64"))
+
+
+class ChunkStore:
+    """Record ids, texts and categories of an index, looked up by FAISS id.
+
+    Written by `init_rag_db` next to the FAISS index, one directory per index:
+
+        ids.bin, ids.offsets.npy                         record `_id`
+        texts.bin, texts.offsets.npy                     chunk text / description
+        category_codes.npy                               int16 code per record
+        category_names.bin, category_names.offsets.npy   code → category name
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.ids = StringColumn(os.path.join(directory, "ids"))
+        self.texts = StringColumn(os.path.join(directory, "texts"))
+        self.category_codes = np.load(
+            os.path.join(directory, "category_codes.npy"), mmap_mode="r"
+        )
+        names = StringColumn(os.path.join(directory, "category_names"))
+        self.category_names = [names[i] for i in range(len(names))]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, i):
+        return 0 <= i < len(self.ids)
+
+    def get_id(self, i, default="UNKNOWN_ID"):
+        return self.ids[i] if i in self else default
+
+    def get_text(self, i, default="<no text>"):
+        return self.texts[i] if i in self else default
+
+    def get_category(self, i, default=""):
+        return self.category_names[self.category_codes[i]] if i in self else default
+
+    def category_ids(self, categories):
+        """Return the sorted FAISS ids of the records in any of `categories`."""
+        codes = [
+            code for code, name in enumerate(self.category_names) if name in categories
+        ]
+        return np.flatnonzero(np.isin(self.category_codes, codes)).astype("int64")
+
+    @staticmethod
+    def write(directory, ids, texts, categories=None):
+        writer = ChunkStoreWriter(directory)
+        if categories is None:
+            categories = [""] * len(ids)
+        for record_id, text, category in zip(ids, texts, categories):
+            writer.append(record_id, text, category)
+        writer.close()
+
+
+class ChunkStoreWriter:
+    """Writes a `ChunkStore` one record at a time, the next FAISS id each."""
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._ids = StringColumnWriter(os.path.join(directory, "ids"))
+        self._texts = StringColumnWriter(os.path.join(directory, "texts"))
+        self._category_codes = array("h")
+        self._category_names = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def append(self, record_id, text, category=""):
+        self._ids.append(record_id)
+        self._texts.append(text)
+        code = self._category_names.setdefault(category, len(self._category_names))
+        self._category_codes.append(code)
+
+    def close(self):
+        self._ids.close()
+        self._texts.close()
+        StringColumn.write(
+            os.path.join(self.directory, "category_names"), list(self._category_names)
+        )
+        save_array(
+            os.path.join(self.directory, "category_codes.npy"),
+            np.frombuffer(self._category_codes, "int16"),
+        )
@@ -0,0 +1,121 @@
+import re
+import logging
+import threading
+import src.config as config
+from src.core.lru_cache import LRUCache
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class ContextPacker:
+    """Fits retrieved chunks into a token budget, most relevant chunk first.
+
+    Tokens are counted with the tokenizer of the backend the prompt goes to,
+    either given directly or loaded by name on first use. Counts are cached
+    per chunk text, so a chunk retrieved again is not tokenized again.
+
+    Loading by name needs the tokenizer files of the model on the Hugging
+    Face Hub, which for a gated model means an accepted licence and a token
+    with access to it. If the tokenizer cannot be loaded, tokens are
+    estimated as one per CHARS_PER_TOKEN characters instead, so the
+    questions are still answered with a roughly packed context.
+    """
+
+    CHARS_PER_TOKEN = 4
+
+    def __init__(
+        self,
+        budget,
+        tokenizer=None,
+        tokenizer_name=None,
+        cache_size=config.TOKEN_COUNT_CACHE_SIZE,
+    ):
+        self.budget = budget
+        self.tokenizer_name = tokenizer_name
+        self.token_counts = LRUCache(cache_size)
+        self._tokenizer = tokenizer
+        self._lock = threading.Lock()
+
+    @property
+    def tokenizer(self):
+        """The tokenizer, or None when it could not be loaded."""
+        # Only load the tokenizer once a prompt is actually packed
+        with self._lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+
+                print(f"Loading tokenizer of {self.tokenizer_name}...")
+                try:
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                except Exception as e:
+                    # Not retried, e.g. a gated model stays gated
+                    logger.warning(
+                        f"Could not load the tokenizer of {self.tokenizer_name}, "
+                        f"estimating token counts from characters instead: {e}"
+                    )
+                    self._tokenizer = False
+        return self._tokenizer or None
+
+    def encoded_length(self, text):
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return -(-len(text) // self.CHARS_PER_TOKEN)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+
+    def count_tokens(self, text):
+        count = self.token_counts.get(text)
+        if count is None:
+            count = self.encoded_length(text)
+            self.token_counts.put(text, count)
+        return count
+
+    def truncate(self, chunk, budget):
+        """Return the leading sentences of `chunk` that fit in `budget` tokens."""
+        kept = ""
+        for sentence in SENTENCE_END.split(chunk):
+            candidate = f"{kept} {sentence}" if kept else sentence
+            # Not cached, the prefixes of a chunk are rarely asked twice
+            if self.encoded_length(candidate) > budget:
+                break
+            kept = candidate
+        return kept
+
+    def pack(self, chunks, separator="\n\n"):
+        """Return the context made of `chunks`, in order, within the budget.
+
+        Chunks that fit are kept whole. A chunk too long for what is left is
+        cut after its last sentence that fits, and skipped when not even
+        its first sentence does.
+        """
+        separator_tokens = self.count_tokens(separator)
+        packed = []
+        used = 0
+        truncated = 0
+        for chunk in chunks:
+            cost = self.count_tokens(chunk) + (separator_tokens if packed else 0)
+            if used + cost <= self.budget:
+                packed.append(chunk)
+                used += cost
+                continue
+
+            separator_cost = separator_tokens if packed else 0
+            left = self.budget - used - separator_cost
+            chunk = self.truncate(chunk, left) if left > 0 else ""
+            if chunk:
+                packed.append(chunk)
+                used += self.encoded_length(chunk)
+                used += separator_cost
+                truncated += 1
+
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(
+                f"Context packed: {len(packed)} of {len(chunks)} chunks "
+                f"({truncated} truncated), about {used}/{self.budget} tokens"
+            )
+            logger.debug(f"Token count cache: {self.token_counts.stats()}")
+
+        return separator.join(packed)
@@ -0,0 +1,49 @@
+import time
+import logging
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def load_cpu_model(
+    model_name,
+    quantize=config.LOCAL_CPU_QUANTIZE,
+    compile_model=config.LOCAL_CPU_COMPILE,
+    num_threads=config.LOCAL_CPU_THREADS,
+):
+    """Load a causal LM and its tokenizer for inference on CPU.
+
+    Weights are loaded in float32, as bfloat16 matmuls are emulated on most
+    CPUs. With `quantize`, the linear layers (nearly all the weights and
+    compute) use dynamic int8 quantization; `compile_model` wraps the forward
+    pass in `torch.compile`. `num_threads` sets the torch intra-op threads,
+    0 keeps the torch default (one per physical core).
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+
+    start_time = time.time()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForCausalLM.from_pretrained(model_name, torch_dtype=torch.float32)
+    model.eval()
+
+    if quantize:
+        from torch.ao.quantization import quantize_dynamic
+
+        model = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    if compile_model:
+        # Dynamic shapes, the prompt and cache lengths change at each step
+        model.forward = torch.compile(model.forward, dynamic=True)
+
+    logger.info(
+        f"Loaded '{model_name}' on CPU in {time.time() - start_time:.1f} seconds "
+        f"(int8: {quantize}, compiled: {compile_model}, "
+        f"threads: {torch.get_num_threads()})"
+    )
+    return model, tokenizer
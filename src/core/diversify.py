@@ -0,0 +1,85 @@
+import logging
+import numpy as np
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def maximal_marginal_relevance(
+    relevance,
+    vectors,
+    top_k,
+    lambda_mult=config.MMR_LAMBDA,
+    dedup_threshold=config.DEDUP_THRESHOLD,
+):
+    """Pick up to `top_k` candidates that are relevant but not redundant.
+
+    Each step picks the candidate maximizing
+    `lambda_mult * relevance - (1 - lambda_mult) * max cosine to the picked ones`,
+    and drops every candidate whose cosine to a picked one reaches
+    `dedup_threshold`. The cosine matrix of the candidates is computed once.
+    Returns the picked rows of `vectors`, in pick order.
+    """
+    relevance = np.asarray(relevance, dtype="float32")
+    if len(relevance) == 0 or top_k <= 0:
+        return []
+
+    vectors = normalize_rows(vectors)
+    similarity = vectors @ vectors.T
+
+    max_similarity = np.zeros(len(relevance), dtype="float32")
+    available = np.ones(len(relevance), dtype=bool)
+    picked = []
+    while len(picked) < top_k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+
+        max_similarity = np.maximum(max_similarity, similarity[best])
+        available[best] = False
+        available &= max_similarity < dedup_threshold
+
+    return picked
+
+
+def min_max_scale(scores):
+    scores = np.asarray(scores, dtype="float32")
+    spread = scores.max() - scores.min()
+    return (scores - scores.min()) / spread if spread else np.ones_like(scores)
+
+
+def diversify_hits(query_vec, hits, vectors, top_k):
+    """Reorder text hits by MMR over their stored vectors, keeping `top_k`.
+
+    `vectors` is the float store indexed by FAISS id, so nothing is encoded
+    again. Relevance is the cross-encoder score of reranked hits, else the
+    rank fusion score of hybrid hits, both scaled to [0, 1], and the cosine
+    to the question otherwise. Keyword-only hits thus keep the rank the
+    fusion gave them instead of being judged by their embedding alone.
+    """
+    if not hits:
+        return hits
+
+    candidates = normalize_rows(vectors[[hit["faiss_id"] for hit in hits]])
+    if all("rerank_score" in hit for hit in hits):
+        relevance = min_max_scale([hit["rerank_score"] for hit in hits])
+    elif all("rrf_score" in hit for hit in hits):
+        relevance = min_max_scale([hit["rrf_score"] for hit in hits])
+    else:
+        relevance = candidates @ normalize_rows(query_vec.reshape(1, -1))[0]
+
+    picked = maximal_marginal_relevance(relevance, candidates, top_k)
+
+    if config.LOG_LEVEL == "DEBUG":
+        logger.debug(f"MMR kept {len(picked)} of {len(hits)} hits")
+
+    return [hits[row] for row in picked]
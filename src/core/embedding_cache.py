@@ -0,0 +1,82 @@
+import os
+import hashlib
+import numpy as np
+from src.core.chunk_store import save_array
+
+
+def content_hash(model_name, text):
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class ChunkEmbeddingCache:
+    """On-disk embeddings of chunk texts, keyed by a hash of the model and text.
+
+    Used by `init_rag_db` so a rebuild only runs the encoder on chunks that
+    are new or whose text changed. Stored as `keys.npy` (hex digests) and
+    `vectors.npy` (float32, one row per key). A stored cache whose vectors
+    are not `dimension` wide is ignored, and replaced on the next save.
+    """
+
+    def __init__(self, directory, model_name, dimension=None):
+        self.directory = directory
+        self.model_name = model_name
+        self.dimension = dimension
+        self._rows = {}
+        self._vectors = []
+        self.encoded = 0
+
+        keys_file = os.path.join(directory, "keys.npy")
+        vectors_file = os.path.join(directory, "vectors.npy")
+        if os.path.exists(keys_file) and os.path.exists(vectors_file):
+            keys = np.load(keys_file)
+            vectors = np.load(vectors_file)
+            if len(keys) and dimension is not None and vectors.shape[1] != dimension:
+                print(
+                    f"⚠️ Embedding cache vectors have {vectors.shape[1]} dimensions, "
+                    f"not {dimension}, encoding every chunk again"
+                )
+                return
+            self._rows = {str(key): row for row, key in enumerate(keys)}
+            self._vectors = list(vectors)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def hashes(self, texts):
+        return [content_hash(self.model_name, text) for text in texts]
+
+    def embed(self, texts, encode):
+        """Return the float32 embeddings of `texts`, encoding only cache misses.
+
+        `encode` takes a list of texts and returns their embeddings.
+        """
+        hashes = self.hashes(texts)
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = np.array(encode(list(missing.values()))).astype("float32")
+            for key, vector in zip(missing, vectors):
+                self._rows[key] = len(self._vectors)
+                self._vectors.append(vector)
+            self.encoded += len(missing)
+
+        if not hashes:
+            return np.zeros((0, 0), dtype="float32")
+        return np.vstack([self._vectors[self._rows[key]] for key in hashes])
+
+    def save(self, keep=None):
+        """Write the cache, keeping only the `keep` hashes when given."""
+        os.makedirs(self.directory, exist_ok=True)
+        keys = [key for key in self._rows if keep is None or key in keep]
+        vectors = [self._vectors[self._rows[key]] for key in keys]
+
+        save_array(
+            os.path.join(self.directory, "keys.npy"), np.array(keys, dtype="U64")
+        )
+        save_array(
+            os.path.join(self.directory, "vectors.npy"),
+            np.vstack(vectors) if vectors else np.zeros((0, 0), dtype="float32"),
+        )
@@ -0,0 +1,273 @@
+import os
+import math
+import logging
+import numpy as np
+import faiss
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "sq8", "fp16", "binary")
+# Index types that must be trained on a sample before vectors can be added
+TRAINED_INDEX_TYPES = ("ivf_flat", "ivf_pq", "sq8")
+
+
+def binarize(vectors):
+    # One bit per dimension: 384 float32 values become 48 bytes
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+class BinaryHashIndex:
+    """Sign-bit hashes of the embeddings, searched by Hamming distance.
+
+    Wraps a FAISS binary index so it takes the same float vectors as the
+    other index types. Distances are bit counts, so results are always
+    re-scored against the stored float vectors.
+    """
+
+    def __init__(self, index):
+        self.index = index
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    @property
+    def d(self):
+        return self.index.d
+
+    def add(self, vectors):
+        self.index.add(binarize(vectors))
+
+    def add_with_ids(self, vectors, ids):
+        self.index.add_with_ids(binarize(vectors), ids)
+
+    def remove_ids(self, ids):
+        return self.index.remove_ids(ids)
+
+    def search(self, vectors, k):
+        distances, indices = self.index.search(binarize(vectors), k)
+        return distances.astype("float32"), indices
+
+    def reconstruct(self, i):
+        raise RuntimeError("Binary hashes cannot be reconstructed")
+
+
+def index_factory_string(index_type, num_vectors):
+    """Return the `faiss.index_factory` description of an index type.
+
+    IVF and PQ sizes are capped by the number of vectors, so small corpora
+    still get an index FAISS can train.
+    """
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{config.FAISS_HNSW_M},Flat"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "fp16":
+        return "SQfp16"
+
+    # FAISS wants about 39 training points per IVF cluster
+    nlist = max(1, min(config.FAISS_NLIST, num_vectors // 39))
+    if index_type == "ivf_flat":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        nbits = max(1, min(config.FAISS_PQ_NBITS, int(math.log2(max(num_vectors, 2)))))
+        return f"IVF{nlist},PQ{config.FAISS_PQ_M}x{nbits}"
+
+    raise ValueError(
+        f"Unknown FAISS index type '{index_type}', expected one of {INDEX_TYPES}"
+    )
+
+
+def sample_training_set(embeddings, max_size=config.FAISS_TRAIN_SAMPLE_SIZE, seed=0):
+    if len(embeddings) <= max_size:
+        return embeddings
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=max_size, replace=False))
+    return embeddings[rows]
+
+
+def build_index(embeddings, index_type=config.FAISS_INDEX_TYPE, ids=None):
+    """Build and fill an index of the given type over float32 embeddings.
+
+    With `ids`, the index is wrapped in an ID map so vectors keep these ids
+    and can later be removed or replaced one by one.
+    """
+    if index_type == "binary":
+        index = faiss.IndexBinaryFlat(embeddings.shape[1])
+        if ids is None:
+            index = BinaryHashIndex(index)
+            index.add(embeddings)
+        else:
+            index = BinaryHashIndex(faiss.IndexBinaryIDMap2(index))
+            index.add_with_ids(embeddings, ids)
+        return index
+
+    description = index_factory_string(index_type, len(embeddings))
+    index = faiss.index_factory(embeddings.shape[1], description)
+
+    if index_type == "hnsw":
+        faiss.ParameterSpace().set_index_parameter(
+            index, "efConstruction", config.FAISS_EF_CONSTRUCTION
+        )
+
+    if not index.is_trained:
+        training_set = sample_training_set(embeddings)
+        print(f"🏋️ Training '{description}' index on {len(training_set)} vectors...")
+        index.train(training_set)
+
+    if ids is None:
+        index.add(embeddings)
+    else:
+        index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, ids)
+
+    apply_search_params(index)
+    return index
+
+
+def supports_removal(index):
+    """Return True if vectors can be removed from the index (HNSW cannot)."""
+    if isinstance(index, BinaryHashIndex):
+        return True
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return not isinstance(index, faiss.IndexHNSW)
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """Set `nprobe` (IVF) and `efSearch` (HNSW) on an index that uses them."""
+    if isinstance(index, BinaryHashIndex):
+        return
+
+    params = {
+        "nprobe": config.FAISS_NPROBE if nprobe is None else nprobe,
+        "efSearch": config.FAISS_EF_SEARCH if ef_search is None else ef_search,
+    }
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        try:
+            space.set_index_parameter(index, name, value)
+        except RuntimeError:
+            # The parameter does not apply to this index type
+            continue
+        logger.debug(f"FAISS search parameter {name}={value}")
+
+
+def id_selector(ids):
+    """Return a FAISS selector accepting only the sorted `ids`."""
+    if len(ids) and ids[-1] - ids[0] + 1 == len(ids):
+        # Contiguous ids, e.g. a category written in one block
+        return faiss.IDSelectorRange(int(ids[0]), int(ids[-1]) + 1)
+    return faiss.IDSelectorBatch(np.ascontiguousarray(ids, dtype="int64"))
+
+
+def search_parameters(index, selector):
+    """Return search parameters restricting `index` to `selector`.
+
+    FAISS wants the parameter class of the index type, and reads `nprobe`
+    and `efSearch` from it instead of the index, so the current values are
+    copied over. Returns None for binary indexes, which take no selector.
+    """
+    if isinstance(index, BinaryHashIndex):
+        return None
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def search_subset(query_vecs, ids, vectors, top_k):
+    """Exact search restricted to `ids`, over their stored float vectors.
+
+    Returns distances and ids like `index.search`, padded with -1.
+    """
+    distances = np.full((len(query_vecs), top_k), np.inf, dtype="float32")
+    indices = np.full((len(query_vecs), top_k), -1, dtype="int64")
+    k = min(top_k, len(ids))
+    if k:
+        rows = np.asarray(vectors[ids], dtype="float32")
+        distances[:, :k], found = faiss.knn(query_vecs, rows, k)
+        indices[:, :k] = ids[found]
+    return distances, indices
+
+
+def has_exact_distances(index):
+    """Return False for indexes whose distances come from compressed codes."""
+    if isinstance(index, BinaryHashIndex):
+        return False
+    index = faiss.downcast_index(index)
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        index = faiss.downcast_index(index.index)
+    return isinstance(index, (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexIVFFlat))
+
+
+def rescore(query_vecs, indices, vectors, top_k):
+    """Re-rank candidates by exact L2 distance to their stored float vectors.
+
+    `indices` holds the candidate ids of each query (-1 for none). Only the
+    candidate rows of `vectors` are read, which keeps an mmap-ed float store
+    mostly on disk.
+    """
+    valid = indices >= 0
+    rows = vectors[np.where(valid, indices, 0).ravel()].astype("float32")
+    rows = rows.reshape(indices.shape[0], indices.shape[1], -1)
+    distances = ((rows - query_vecs[:, None, :]) ** 2).sum(axis=2)
+    distances[~valid] = np.inf
+
+    order = np.argsort(distances, axis=1, kind="stable")[:, :top_k]
+    distances = np.take_along_axis(distances, order, axis=1)
+    indices = np.take_along_axis(indices, order, axis=1)
+    indices[np.isinf(distances)] = -1
+    return distances, indices
+
+
+def index_size(index):
+    """Return the serialized size of an index, in bytes."""
+    if isinstance(index, BinaryHashIndex):
+        return len(faiss.serialize_index_binary(index.index))
+    return len(faiss.serialize_index(index))
+
+
+def read_index(path, mmap=config.FAISS_MMAP):
+    """Read an index from disk, mapping it read-only when `mmap` is set."""
+    # FAISS binary indexes have a four-letter code starting with "IB"
+    with open(path, "rb") as f:
+        if f.read(2) == b"IB":
+            return BinaryHashIndex(faiss.read_index_binary(path))
+
+    if not mmap:
+        return faiss.read_index(path)
+
+    # Flat and HNSW storage is mapped with IO_FLAG_MMAP_IFC, IVF inverted lists
+    # with IO_FLAG_MMAP only, and FAISS rejects the wrong one for each
+    for flags in (
+        faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+        faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY,
+    ):
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError as e:
+            logger.debug(f"FAISS mmap read with flags {flags} failed: {e}")
+
+    logger.warning(f"FAISS index '{path}' cannot be mapped, reading it in memory")
+    return faiss.read_index(path)
+
+
+def write_index(index, path):
+    # Processes may have the old file mapped, so replace it instead of rewriting it
+    tmp_path = path + ".tmp"
+    if isinstance(index, BinaryHashIndex):
+        faiss.write_index_binary(index.index, tmp_path)
+    else:
+        faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
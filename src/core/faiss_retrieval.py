@@ -2,151 +2,609 @@ import os
 import json
 import time
 import logging
+import threading
 import numpy as np
-import faiss
 from sentence_transformers import SentenceTransformer
 import src.config as config
+from src.core.bm25 import BM25Index, reciprocal_rank_fusion
+from src.core.chunk_store import ChunkStore
+from src.core.diversify import diversify_hits
+from src.core.faiss_index import (
+    apply_search_params,
+    has_exact_distances,
+    id_selector,
+    read_index,
+    rescore,
+    search_parameters,
+    search_subset,
+)
+from src.core.lru_cache import LRUCache
+from src.core.question_analysis import normalize_question
+from src.core.reranker import CrossEncoderReranker
 
 # Setup logging
 config.setup_logging()
 logger = logging.getLogger(__name__)
 
-# Load FAISS index
-print("Loading FAISS index...")
-index = faiss.read_index(config.INDEX_FILE)
 
-# Load ID map (int ID → string _id)
-with open(config.ID_MAP_FILE, "r", encoding="utf-8") as f:
-    id_map = json.load(f)
+def read_generation():
+    """Return the current generation of the files in `LOCAL_RAG/`.
+
+    `init_rag_db` writes the generation file after every other file, so it
+    only changes once a rebuild is complete. Older builds without it fall back
+    to the modification times of the index and store files.
+    """
+    try:
+        with open(config.GENERATION_FILE, "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        watched = [
+            config.INDEX_FILE,
+            config.TEXT_STORE_DIR,
+            config.IMAGE_INDEX_FILE,
+            config.IMAGE_STORE_DIR,
+        ]
+        return "mtime:" + ",".join(
+            str(os.stat(path).st_mtime_ns) if os.path.exists(path) else "-"
+            for path in watched
+        )
+
 
-# Load text store (int ID → full record)
-with open(config.TEXT_STORE_FILE, "r", encoding="utf-8") as f:
-    text_store = json.load(f)
+def load_vectors(path):
+    # Builds made before the float vector store only have the index
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def search_index(index, exact, vectors, query_vecs, top_k, id_filter=None):
+    """Search an index, re-scoring compressed distances with the float vectors.
+
+    `id_filter`, a `CategoryFilter`, restricts the search to its ids.
+    """
+    if id_filter is None:
+        search = index.search
+    elif id_filter.params is None or not len(id_filter.ids):
+        # Binary indexes take no selector, search the stored vectors instead
+        return search_subset(query_vecs, id_filter.ids, vectors, top_k)
+    else:
+
+        def search(query_vecs, k):
+            return index.search(query_vecs, k, params=id_filter.params)
+
+    if exact or vectors is None:
+        return search(query_vecs, top_k)
+    _, candidates = search(query_vecs, top_k * config.RESCORE_FACTOR)
+    return rescore(query_vecs, candidates, vectors, top_k)
+
+
+class CategoryFilter:
+    """Text chunks of some categories, as FAISS ids, a BM25 mask and search parameters."""
+
+    def __init__(self, store, index, categories):
+        self.ids = store.category_ids(categories)
+        self.mask = np.zeros(len(store), dtype=bool)
+        self.mask[self.ids] = True
+        # The parameters do not keep the selector alive
+        self.selector = id_selector(self.ids)
+        self.params = search_parameters(index, self.selector)
+
+
+class IndexSnapshot:
+    """Indexes and stores of one generation, loaded together and never mutated."""
+
+    def __init__(self, generation):
+        self.generation = generation
+
+        # Load FAISS index
+        self.index = read_index(config.INDEX_FILE)
+        apply_search_params(self.index)
+        self.text_exact = has_exact_distances(self.index)
+        self.text_vectors = load_vectors(config.TEXT_VECTORS_FILE)
+
+        # Map text store (int ID → _id, chunk text, category)
+        self.text_store = ChunkStore(config.TEXT_STORE_DIR)
+
+        # Load image FAISS index
+        self.image_index = read_index(config.IMAGE_INDEX_FILE)
+        apply_search_params(self.image_index)
+        self.image_exact = has_exact_distances(self.image_index)
+        self.image_vectors = load_vectors(config.IMAGE_VECTORS_FILE)
+
+        # Map image store (int ID → image id, description)
+        self.img_store = ChunkStore(config.IMAGE_STORE_DIR)
+
+        # Per-category text indexes, when built with FAISS_CATEGORY_INDEXES
+        self.category_indexes = {}
+        names_file = os.path.join(config.CATEGORY_INDEX_DIR, "names.json")
+        if config.FAISS_CATEGORY_INDEXES and os.path.exists(names_file):
+            with open(names_file, "r", encoding="utf-8") as f:
+                names = json.load(f)
+            for code, name in enumerate(names):
+                index = read_index(
+                    os.path.join(config.CATEGORY_INDEX_DIR, f"{code}.faiss")
+                )
+                apply_search_params(index)
+                self.category_indexes[name] = index
+
+        # Filters of the category sets recently asked for
+        self.category_filters = LRUCache(32)
+
+        # Map keyword indexes, missing in builds made before hybrid search
+        self.text_bm25 = None
+        self.image_bm25 = None
+        if os.path.isdir(config.TEXT_BM25_DIR):
+            self.text_bm25 = BM25Index(config.TEXT_BM25_DIR)
+        if os.path.isdir(config.IMAGE_BM25_DIR):
+            self.image_bm25 = BM25Index(config.IMAGE_BM25_DIR)
+
+    def category_filter(self, categories):
+        key = frozenset(categories)
+        category_filter = self.category_filters.get(key)
+        if category_filter is None:
+            category_filter = CategoryFilter(self.text_store, self.index, key)
+            self.category_filters.put(key, category_filter)
+        return category_filter
+
+    def search_text(self, query_vecs, top_k, categories=None):
+        """Search the text index, restricted to `categories` when given.
+
+        Searches the per-category indexes when there is one for every
+        category, otherwise the main index filtered by id.
+        """
+        if not categories:
+            return search_index(
+                self.index, self.text_exact, self.text_vectors, query_vecs, top_k
+            )
 
-# Load images ID map (int ID → string id)
-with open(config.IMAGE_ID_MAP_FILE, "r", encoding="utf-8") as f:
-    img_id_map = json.load(f)
+        if all(category in self.category_indexes for category in categories):
+            results = [
+                search_index(
+                    self.category_indexes[category],
+                    has_exact_distances(self.category_indexes[category]),
+                    self.text_vectors,
+                    query_vecs,
+                    top_k,
+                )
+                for category in sorted(set(categories))
+            ]
+            distances = np.hstack([distances for distances, _ in results])
+            indices = np.hstack([indices for _, indices in results])
+            order = np.argsort(distances, axis=1, kind="stable")[:, :top_k]
+            return (
+                np.take_along_axis(distances, order, axis=1),
+                np.take_along_axis(indices, order, axis=1),
+            )
 
-# Load image store (int ID → img description)
-with open(config.IMAGE_STORE_FILE, "r", encoding="utf-8") as f:
-    img_store = json.load(f)
+        return search_index(
+            self.index,
+            self.text_exact,
+            self.text_vectors,
+            query_vecs,
+            top_k,
+            id_filter=self.category_filter(categories),
+        )
 
-# Load embedding model
-print("Loading embedding model...")
-model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+    def text_hit(self, idx, dist):
+        return {
+            "id": self.text_store.get_id(idx),
+            "faiss_id": int(idx),
+            "distance": float(dist),
+            "chunk_text": self.text_store.get_text(idx),
+        }
+
+    def image_hit(self, idx, dist):
+        record_id = self.img_store.get_id(idx)
+        return {
+            "description": self.img_store.get_text(idx, "<no description>"),
+            # Construct local image path
+            "image_path": os.path.join(
+                "data", "griffith_img", f"Griffith_history-{record_id}.jpg"
+            ),
+            "distances": dist,
+            "faiss_id": int(idx),
+        }
+
+
+def exact_distance(index, vectors, query_vec, faiss_id):
+    # Keyword-only hits have no FAISS distance, compute it from the stored vector
+    if vectors is not None:
+        vector = vectors[faiss_id].astype("float32")
+    else:
+        try:
+            vector = index.reconstruct(int(faiss_id))
+        except RuntimeError:
+            return float("inf")
+    return float(((vector - query_vec) ** 2).sum())
+
+
+def fuse_lexical_hits(
+    query, query_vec, dense_hits, bm25, index, vectors, make_hit, limit, allowed=None
+):
+    """Merge the dense hits of one query with its BM25 hits by rank fusion.
+
+    `allowed` is the BM25 mask of a category filter, if any.
+    """
+    lexical = bm25.search(query, config.BM25_TOP_K, allowed=allowed)
+    fused = reciprocal_rank_fusion(
+        [[hit["faiss_id"] for hit in dense_hits], [doc_id for doc_id, _ in lexical]],
+        k=config.RRF_K,
+    )
 
+    dense_by_id = {hit["faiss_id"]: hit for hit in dense_hits}
+    hits = []
+    for doc_id, score in fused[:limit]:
+        hit = dense_by_id.get(doc_id)
+        if hit is None:
+            hit = make_hit(doc_id, exact_distance(index, vectors, query_vec, doc_id))
+        hit["rrf_score"] = score
+        hits.append(hit)
 
-def get_context_retrieval(query, top_k=10):
-    start_time = time.time()
     if config.LOG_LEVEL == "DEBUG":
         logger.debug(
-            f"FAISS search start: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}"
+            f"Hybrid search: {len(dense_hits)} dense and {len(lexical)} keyword hits "
+            f"fused into {len(hits)}"
         )
 
-    # Embed query
-    query_vec = model.encode([query])
-    query_vec = np.array(query_vec).astype("float32")
+    return hits
+
+
+class RetrievalEngine:
+    """Keeps the text and image indexes in memory and serves searches from them.
+
+    Each search works on the snapshot it started with. When the generation of
+    `LOCAL_RAG/` changes, a new snapshot is loaded and swapped in; searches
+    already running keep the old one until they return.
+    """
+
+    def __init__(self, check_interval=config.RELOAD_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._last_check = 0.0
+        self.embedding_cache = LRUCache(config.EMBEDDING_CACHE_SIZE)
+        self.reranker = CrossEncoderReranker() if config.RERANK_ENABLED else None
+
+        print("Loading FAISS index...")
+        self.snapshot()
+
+        # Load embedding model
+        print("Loading embedding model...")
+        self.model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+
+    @property
+    def generation(self):
+        return self.snapshot().generation
+
+    def snapshot(self):
+        """Return the current snapshot, reloading it if the files were rebuilt."""
+        snapshot = self._snapshot
+        if (
+            snapshot is not None
+            and time.monotonic() - self._last_check < self.check_interval
+        ):
+            return snapshot
+
+        with self._lock:
+            # Another thread may have checked while this one waited for the lock
+            if (
+                self._snapshot is not None
+                and time.monotonic() - self._last_check < self.check_interval
+            ):
+                return self._snapshot
+            self._last_check = time.monotonic()
+            self._refresh()
+            return self._snapshot
+
+    def reload(self):
+        """Reload the files now, even if the generation did not change."""
+        with self._lock:
+            self._last_check = time.monotonic()
+            self._refresh(force=True)
+
+    def _refresh(self, force=False):
+        generation = read_generation()
+        if (
+            not force
+            and self._snapshot is not None
+            and self._snapshot.generation == generation
+        ):
+            return
+
+        try:
+            snapshot = IndexSnapshot(generation)
+        except Exception as e:
+            # A rebuild may be in progress, keep serving the previous generation
+            if self._snapshot is None:
+                raise
+            logger.warning(f"FAISS reload failed, keeping previous index: {e}")
+            return
+
+        self._snapshot = snapshot
+        logger.info(
+            f"FAISS index generation {generation} loaded "
+            f"({snapshot.index.ntotal} text, {snapshot.image_index.ntotal} image vectors)"
+        )
 
-    # Search FAISS index
-    distances, indices = index.search(query_vec, top_k)
+    def encode(self, query):
+        """Embed a question, reusing the cached vector for a repeated question."""
+        return self.encode_batch([query])
 
-    end_time = time.time()
-    elapsed = end_time - start_time
+    def encode_batch(self, queries):
+        """Embed several questions, running the encoder once over the cache misses."""
+        keys = [normalize_question(query) for query in queries]
+        cached = [self.embedding_cache.get(key) for key in keys]
 
-    results = []
-    context_chunks = []
+        missing = {}
+        for query, key, query_vec in zip(queries, keys, cached):
+            if query_vec is None and key not in missing:
+                missing[key] = query
 
-    for i, (dist, idx) in enumerate(zip(distances[0], indices[0]), 1):
-        if idx == -1:
-            continue
-        str_id = str(idx)
-        record_id = id_map.get(str_id, "UNKNOWN_ID")
-        chunk_text = text_store.get(str_id, {}).get("chunk_text", "<no text>")
+        encoded = {}
+        if missing:
+            vectors = self.model.encode(list(missing.values()))
+            vectors = np.array(vectors).astype("float32")
+            for key, query_vec in zip(missing, vectors):
+                encoded[key] = query_vec.reshape(1, -1)
+                self.embedding_cache.put(key, encoded[key])
 
-        results.append(
-            {
-                "id": record_id,
-                "distance": float(dist),
-                "chunk_text": chunk_text,
-            }
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(f"Embedding cache: {self.embedding_cache.stats()}")
+
+        return np.vstack(
+            [
+                query_vec if query_vec is not None else encoded[key]
+                for key, query_vec in zip(keys, cached)
+            ]
         )
 
-        context_chunks.append(chunk_text)
+    def search(self, query, top_k=10, image_top_k=10, categories=None):
+        """Embed the query once and search both the text and image indexes."""
+        return self.search_batch(
+            [query], top_k=top_k, image_top_k=image_top_k, categories=categories
+        )[0]
+
+    def search_batch(self, queries, top_k=10, image_top_k=10, categories=None):
+        """Search many questions with one encoder call and one search per index.
+
+        Returns one result per question, in the order of `queries`:
+        `{"hits": [...], "images": [...], "rerank_units": ...}`, where each
+        text hit has the record `id`, its `distance` and its `chunk_text`.
+        `categories` (a name or a list of names, e.g. "bibliography")
+        restricts the text hits to chunks of these categories.
+        """
+        if not queries:
+            return []
+        if isinstance(categories, str):
+            categories = [categories]
+
+        snapshot = self.snapshot()
+        query_vecs = self.encode_batch(queries)
+
+        hits_per_query, rerank_units = self.search_text_batch(
+            snapshot, queries, query_vecs, top_k, categories
+        )
+        images_per_query = self.search_images_batch(
+            snapshot, queries, query_vecs, image_top_k
+        )
 
+        return [
+            {"hits": hits, "images": images, "rerank_units": units}
+            for hits, images, units in zip(
+                hits_per_query, images_per_query, rerank_units
+            )
+        ]
+
+    def search_text_batch(self, snapshot, queries, query_vecs, top_k, categories=None):
+        """Return the text hits and rerank units of embedded questions.
+
+        The text and image stages of `search_batch` only share the snapshot
+        and the query vectors, so they can run in parallel.
+        """
+        hits_per_query = [[] for _ in queries]
+        rerank_units = ["N/A" for _ in queries]
+        if top_k > 0:
+            fetch_k = top_k
+            if self.reranker:
+                fetch_k = max(fetch_k, config.RERANK_FETCH_K)
+            diversify = config.MMR_ENABLED and snapshot.text_vectors is not None
+            if diversify:
+                fetch_k = max(fetch_k, config.MMR_FETCH_K)
+            hits_per_query = self._search_text(
+                snapshot, query_vecs, fetch_k, categories
+            )
+            if config.HYBRID_SEARCH and snapshot.text_bm25 is not None:
+                allowed = (
+                    snapshot.category_filter(categories).mask if categories else None
+                )
+                hits_per_query = [
+                    fuse_lexical_hits(
+                        query,
+                        query_vec,
+                        hits,
+                        snapshot.text_bm25,
+                        snapshot.index,
+                        snapshot.text_vectors,
+                        snapshot.text_hit,
+                        fetch_k,
+                        allowed,
+                    )
+                    for query, query_vec, hits in zip(
+                        queries, query_vecs, hits_per_query
+                    )
+                ]
+            if self.reranker:
+                hits_per_query, rerank_units = self.reranker.rerank_batch(
+                    queries, hits_per_query, fetch_k if diversify else top_k
+                )
+            if diversify:
+                # Drop overlapping chunks before they reach the prompt
+                hits_per_query = [
+                    diversify_hits(query_vec, hits, snapshot.text_vectors, top_k)
+                    for query_vec, hits in zip(query_vecs, hits_per_query)
+                ]
+
+        return hits_per_query, rerank_units
+
+    def search_images_batch(self, snapshot, queries, query_vecs, image_top_k):
+        """Return the image hits of embedded questions."""
+        images_per_query = [[] for _ in queries]
+        if image_top_k > 0:
+            images_per_query = self._search_images(snapshot, query_vecs, image_top_k)
+            if config.HYBRID_SEARCH and snapshot.image_bm25 is not None:
+                images_per_query = [
+                    fuse_lexical_hits(
+                        query,
+                        query_vec,
+                        images,
+                        snapshot.image_bm25,
+                        snapshot.image_index,
+                        snapshot.image_vectors,
+                        snapshot.image_hit,
+                        image_top_k,
+                    )
+                    for query, query_vec, images in zip(
+                        queries, query_vecs, images_per_query
+                    )
+                ]
+
+        return images_per_query
+
+    def _search_text(self, snapshot, query_vecs, top_k, categories=None):
+        start_time = time.time()
         if config.LOG_LEVEL == "DEBUG":
             logger.debug(
-                f"Hit #{i} (distance: {dist:.4f}): ID {record_id} - Text: {chunk_text}"
+                f"FAISS search start: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}"
             )
+            if categories:
+                logger.debug(f"FAISS search restricted to categories {categories}")
 
-    if config.LOG_LEVEL == "DEBUG":
-        logger.debug(
-            f"FAISS search end: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}"
-        )
-        logger.debug(f"FAISS search duration: {elapsed:.3f} seconds")
-        logger.debug(f"FAISS retrieved hits count: {len(results)}")
+        # Search FAISS index, one row per query
+        distances, indices = snapshot.search_text(query_vecs, top_k, categories)
 
-    print(
-        f"FAISS search took {elapsed:.3f} seconds, found {len(context_chunks)} results"
-    )
+        end_time = time.time()
+        elapsed = end_time - start_time
 
-    token_count = "N/A"
-    read_units = "N/A"
-    rerank_units = "N/A"
+        hits_per_query = []
 
-    return context_chunks, token_count, read_units, rerank_units
+        for row_distances, row_indices in zip(distances, indices):
+            hits = []
 
+            for i, (dist, idx) in enumerate(zip(row_distances, row_indices), 1):
+                if idx == -1:
+                    continue
+                hit = snapshot.text_hit(idx, dist)
+                hits.append(hit)
 
-def get_image_context_retrieval(query, top_k=10):
-    start_time = time.time()
-    if config.LOG_LEVEL == "DEBUG":
-        logger.debug(
-            f"FAISS image search start: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}"
-        )
+                if config.LOG_LEVEL == "DEBUG":
+                    logger.debug(
+                        f"Hit #{i} (distance: {dist:.4f}): ID {hit['id']} - Text: {hit['chunk_text']}"
+                    )
 
-    # Embed query
-    query_vec = model.encode([query])
-    query_vec = np.array(query_vec).astype("float32")
+            hits_per_query.append(hits)
 
-    # Search FAISS index (assuming you load a separate image index)
-    image_index = faiss.read_index(config.IMAGE_INDEX_FILE)
-    distances, indices = image_index.search(query_vec, top_k)
+        hits_count = sum(len(hits) for hits in hits_per_query)
 
-    end_time = time.time()
-    elapsed = end_time - start_time
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(
+                f"FAISS search end: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}"
+            )
+            logger.debug(f"FAISS search duration: {elapsed:.3f} seconds")
+            logger.debug(f"FAISS retrieved hits count: {hits_count}")
+
+        print(
+            f"FAISS search took {elapsed:.3f} seconds, found {hits_count} results "
+            f"for {len(query_vecs)} queries"
+        )
 
-    results = []
-    context_images = []
+        return hits_per_query
 
-    for i, (dist, idx) in enumerate(zip(distances[0], indices[0]), 1):
-        if idx == -1:
-            continue
-        str_id = str(idx)
-        record_id = img_id_map.get(str_id, "UNKNOWN_ID")
-        # Get description from image store
-        description = img_store.get(str_id, {}).get("description", "<no description>")
+    def _search_images(self, snapshot, query_vecs, top_k):
+        start_time = time.time()
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(
+                f"FAISS image search start: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}"
+            )
 
-        # Construct local image path
-        image_path = os.path.join(
-            "data", "griffith_img", f"Griffith_history-{record_id}.jpg"
+        # Search the image index kept in memory, one row per query
+        distances, indices = search_index(
+            snapshot.image_index,
+            snapshot.image_exact,
+            snapshot.image_vectors,
+            query_vecs,
+            top_k,
         )
 
-        context_images.append({"description": description, "image_path": image_path, "distances": dist},)
+        end_time = time.time()
+        elapsed = end_time - start_time
+
+        images_per_query = []
+
+        for row_distances, row_indices in zip(distances, indices):
+            context_images = []
+
+            for i, (dist, idx) in enumerate(zip(row_distances, row_indices), 1):
+                if idx == -1:
+                    continue
+                image = snapshot.image_hit(idx, dist)
+                context_images.append(image)
+
+                if config.LOG_LEVEL == "DEBUG":
+                    logger.debug(
+                        f"Image Hit #{i} (distance: {dist:.4f}): Description: {image['description']} - Path: {image['image_path']}"
+                    )
+
+            images_per_query.append(context_images)
+
+        hits_count = sum(len(context_images) for context_images in images_per_query)
 
         if config.LOG_LEVEL == "DEBUG":
             logger.debug(
-                f"Image Hit #{i} (distance: {dist:.4f}): ID {record_id} - Description: {description} - Path: {image_path}"
+                f"FAISS image search end: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}"
             )
+            logger.debug(f"FAISS image search duration: {elapsed:.3f} seconds")
+            logger.debug(f"FAISS image retrieved hits count: {hits_count}")
 
-    if config.LOG_LEVEL == "DEBUG":
-        logger.debug(
-            f"FAISS image search end: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(end_time))}"
+        print(
+            f"FAISS image search took {elapsed:.3f} seconds, found {hits_count} results "
+            f"for {len(query_vecs)} queries"
         )
-        logger.debug(f"FAISS image search duration: {elapsed:.3f} seconds")
-        logger.debug(f"FAISS image retrieved hits count: {len(context_images)}")
 
-    print(
-        f"FAISS image search took {elapsed:.3f} seconds, found {len(context_images)} results"
-    )
+        return images_per_query
+
+
+# Shared engine, loaded once per process
+engine = RetrievalEngine()
+
+
+def get_context_retrieval(query, top_k=10, categories=None):
+    result = engine.search(query, top_k=top_k, image_top_k=0, categories=categories)
+    context_chunks = [hit["chunk_text"] for hit in result["hits"]]
+
+    token_count = "N/A"
+    read_units = "N/A"
+    rerank_units = result["rerank_units"]
+
+    return context_chunks, token_count, read_units, rerank_units
+
+
+def get_context_retrieval_batch(queries, top_k=10, categories=None):
+    # Same result as get_context_retrieval for each query, in the same order
+    return [
+        (
+            [hit["chunk_text"] for hit in result["hits"]],
+            "N/A",
+            "N/A",
+            result["rerank_units"],
+        )
+        for result in engine.search_batch(
+            queries, top_k=top_k, image_top_k=0, categories=categories
+        )
+    ]
+
+
+def get_image_context_retrieval(query, top_k=10):
+    context_images = engine.search(query, top_k=0, image_top_k=top_k)["images"]
 
     token_count = "N/A"
     read_units = "N/A"
@@ -155,6 +613,14 @@ def get_image_context_retrieval(query, top_k=10):
     return context_images, token_count, read_units, rerank_units
 
 
+def get_image_context_retrieval_batch(queries, top_k=10):
+    # Same result as get_image_context_retrieval for each query, in the same order
+    return [
+        (result["images"], "N/A", "N/A", "N/A")
+        for result in engine.search_batch(queries, top_k=0, image_top_k=top_k)
+    ]
+
+
 if __name__ == "__main__":
     # Call the image retrieval function with a test query
     query = "Griffith College historical event"
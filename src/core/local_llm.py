@@ -1,8 +1,15 @@
-import torch
-from transformers import pipeline
 import time
+import queue
 import logging
+import datetime
+import threading
 import src.config as config
+from src.core.backends import registry
+from src.core.batch_scheduler import BatchScheduler, BatchStreamer
+from src.core.context_packer import ContextPacker
+from src.core.cpu_profile import load_cpu_model
+from src.core.prefix_cache import PrefixKVCache, common_prefix
+from src.core.speculative import DraftAcceptance, load_draft_model
 from src.core.pinecone_retrieval import get_context_retrieval
 from src.core.question_analysis import is_about_chatbot
 
@@ -10,12 +17,48 @@ from src.core.question_analysis import is_about_chatbot
 config.setup_logging()
 logger = logging.getLogger(__name__)
 
-# Llama 3.2-3B generation pipeline
-pipe = pipeline(
-    "text-generation",
-    model=config.LOCAL_MODEL,
-    torch_dtype=torch.bfloat16,
-    device_map="auto",
+
+def load_pipeline():
+    # torch and transformers are only imported once the local model is used
+    import torch
+    from transformers import pipeline
+
+    # Llama 3.2-3B generation pipeline
+    print("Loading local LLM...")
+    if config.LOCAL_PROFILE == "cpu":
+        model, tokenizer = load_cpu_model(config.LOCAL_MODEL)
+        return pipeline("text-generation", model=model, tokenizer=tokenizer)
+
+    return pipeline(
+        "text-generation",
+        model=config.LOCAL_MODEL,
+        torch_dtype=torch.bfloat16,
+        device_map="auto",
+    )
+
+
+registry.register("local_pipeline", load_pipeline)
+registry.register(
+    "local_prefix_cache",
+    lambda: PrefixKVCache(registry.get("local_pipeline").model),
+)
+registry.register("local_draft_model", load_draft_model)
+
+# Acceptance of the draft model tokens, over all assisted generations
+draft_acceptance = DraftAcceptance()
+
+# Sampling settings shared by streamed and batched generation
+generation_kwargs = {
+    "max_new_tokens": 512,
+    "do_sample": True,
+    "temperature": 0.7,
+    "top_k": 50,
+    "top_p": 0.95,
+}
+
+# Keeps the retrieved context within the prompt budget of this backend
+context_packer = ContextPacker(
+    config.LOCAL_CONTEXT_TOKENS, tokenizer_name=config.LOCAL_MODEL
 )
 
 system_message = {
@@ -24,7 +67,7 @@ system_message = {
 }
 
 
-def local_llm_question(user_input, get_context_retrieval):
+def build_prompt(pipe, user_input, get_context_retrieval):
     question_time = time.time()
     logger.info("Received a question.")
 
@@ -47,9 +90,15 @@ def local_llm_question(user_input, get_context_retrieval):
         context_chunks, tokens, read_units, rerank_units = get_context_retrieval(
             user_input, top_k=5
         )
-        context = "\n\n".join(context_chunks)
+        context = context_packer.pack(context_chunks)
+
+    return pipe.tokenizer.apply_chat_template(
+        build_messages(context, user_input), tokenize=False, add_generation_prompt=True
+    )
+
 
-    messages = [
+def build_messages(context, user_input):
+    return [
         system_message,
         {
             "role": "user",
@@ -60,9 +109,145 @@ def local_llm_question(user_input, get_context_retrieval):
         },
     ]
 
-    prompt = pipe.tokenizer.apply_chat_template(
-        messages, tokenize=False, add_generation_prompt=True
+
+def encode(tokenizer, text):
+    # The chat template already holds the special tokens
+    return tokenizer(text, add_special_tokens=False)["input_ids"]
+
+
+def prompt_prefix_ids(tokenizer):
+    """Return the token ids every prompt starts with.
+
+    That is the system message and the fixed start of the user message,
+    found as the common start of prompts that only differ after it. The
+    markers start with different kinds of characters, so a token that could
+    merge with the start of the context is left out.
+    """
+    prefix = None
+    for marker in ("A", "z", "0", "<", " ", "\n"):
+        prompt = tokenizer.apply_chat_template(
+            build_messages(marker, marker), tokenize=False, add_generation_prompt=True
+        )
+        prompt_ids = encode(tokenizer, prompt)
+        prefix = prompt_ids if prefix is None else common_prefix(prefix, prompt_ids)
+    return prefix
+
+
+def cached_prefix(pipe, prompt_ids):
+    """Return a copy of the KV cache of the prompt prefix, or None if it does not apply."""
+    # Assisted generation does not resume from a prefilled cache correctly
+    if not config.LOCAL_PREFIX_CACHE or config.LOCAL_DRAFT_MODEL:
+        return None
+
+    prefix_cache = registry.get("local_prefix_cache")
+    # The prefix only changes with the system prompt, or the date some chat
+    # templates (e.g. Llama 3) write into it
+    prefix_ids = prefix_cache.prefix_ids(
+        (system_message["content"], datetime.date.today()),
+        lambda: prompt_prefix_ids(pipe.tokenizer),
+    )
+    # At least one token must be left for prefill
+    if (
+        len(prompt_ids) <= len(prefix_ids)
+        or prompt_ids[: len(prefix_ids)] != prefix_ids
+    ):
+        logger.debug("Prompt does not start with the cached prefix")
+        return None
+
+    past_key_values = prefix_cache.get(prefix_ids)
+    if config.LOG_LEVEL == "DEBUG":
+        logger.debug(
+            f"Reusing the KV cache of {len(prefix_ids)} of {len(prompt_ids)} prompt tokens"
+        )
+        logger.debug(f"Prefix KV cache: {prefix_cache.stats()}")
+    return past_key_values
+
+
+def cancel_criteria(cancel_events):
+    """Return stopping criteria ending each row of a batch once its event is set."""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.tensor(
+                [cancel_event.is_set() for cancel_event in cancel_events],
+                dtype=torch.bool,
+                device=input_ids.device,
+            )
+
+    return StoppingCriteriaList([Cancelled()])
+
+
+def run_generate(model, input_ids, **kwargs):
+    """Run `model.generate`, assisted by the draft model when one is set.
+
+    Assisted generation only handles one sequence, a batch is generated
+    without the draft model.
+    """
+    if not config.LOCAL_DRAFT_MODEL or input_ids.shape[0] > 1:
+        return model.generate(input_ids=input_ids, **kwargs)
+
+    draft_model = registry.get("local_draft_model")
+    with draft_acceptance.track(model, draft_model) as calls:
+        outputs = model.generate(
+            input_ids=input_ids, assistant_model=draft_model, **kwargs
+        )
+
+    rate = draft_acceptance.record(calls, outputs.shape[1] - input_ids.shape[1])
+    if config.LOG_LEVEL == "DEBUG":
+        logger.debug(f"Draft tokens accepted: {rate:.1%}")
+        logger.debug(f"Draft acceptance: {draft_acceptance.stats()}")
+    return outputs
+
+
+def local_llm_stream(user_input, get_context_retrieval, cancel_event=None):
+    """Yield the answer in pieces of text, as soon as the model decodes them.
+
+    Generation runs in a background thread feeding a `TextIteratorStreamer`,
+    or with LOCAL_BATCHING in a batch of the scheduler (see `scheduled_stream`).
+    Setting `cancel_event`, or closing the generator, stops it after the
+    current token, so the model is free for the next question.
+    """
+    import torch
+    from transformers import TextIteratorStreamer
+
+    pipe = registry.get("local_pipeline")
+    prompt = build_prompt(pipe, user_input, get_context_retrieval)
+    if cancel_event is None:
+        cancel_event = threading.Event()
+
+    if config.LOCAL_BATCHING:
+        # Generated together with the questions of other concurrent users
+        yield from scheduled_stream(prompt, cancel_event)
+        return
+
+    prompt_ids = encode(pipe.tokenizer, prompt)
+    past_key_values = cached_prefix(pipe, prompt_ids)
+    input_ids = torch.tensor([prompt_ids], device=pipe.model.device)
+
+    streamer = TextIteratorStreamer(
+        pipe.tokenizer, skip_prompt=True, skip_special_tokens=True
     )
+    errors = []
+
+    def generate():
+        try:
+            # generate() on the prompt ids, so they match the cached prefix
+            run_generate(
+                pipe.model,
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=past_key_values,
+                pad_token_id=pipe.tokenizer.eos_token_id,
+                streamer=streamer,
+                stopping_criteria=cancel_criteria([cancel_event]),
+                **generation_kwargs,
+            )
+        except Exception as e:
+            # Unblock the reader, the error is raised again below
+            errors.append(e)
+            streamer.end()
 
     # Log LLM start time
     llm_start_time = time.time()
@@ -71,26 +256,135 @@ def local_llm_question(user_input, get_context_retrieval):
             f"LLM generation started at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(llm_start_time))}"
         )
 
-    # Generate response
-    outputs = pipe(
-        prompt,
-        max_new_tokens=512,
-        do_sample=True,
-        temperature=0.7,
-        top_k=50,
-        top_p=0.95,
-    )
+    thread = threading.Thread(target=generate, daemon=True)
+    thread.start()
+    first_token_time = None
+    try:
+        for text in streamer:
+            if first_token_time is None:
+                first_token_time = time.time()
+                if config.LOG_LEVEL == "DEBUG":
+                    logger.debug(
+                        f"LLM time to first token: {first_token_time - llm_start_time:.3f} seconds"
+                    )
+            yield text
+    finally:
+        # The reader stopped early, stop generating for it
+        if thread.is_alive():
+            cancel_event.set()
+        thread.join()
 
-    llm_end_time = time.time()
-    answer = outputs[0]["generated_text"][len(prompt) :].strip()
+    if errors:
+        raise errors[0]
 
+    llm_end_time = time.time()
     if config.LOG_LEVEL == "DEBUG":
         logger.debug(
             f"LLM generation ended at: {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(llm_end_time))}"
         )
         logger.debug(
             f"LLM generation duration: {llm_end_time - llm_start_time:.3f} seconds"
+            + (" (cancelled)" if cancel_event.is_set() else "")
+        )
+
+
+def generate_batch(prompts, **kwargs):
+    """Generate the answers of several prompts together, in one padded batch.
+
+    Prompts are padded on the left, so they all end where generation starts.
+    A batch of one prompt still reuses the KV cache of the prompt prefix.
+    `kwargs` override the sampling settings.
+    """
+    import torch
+
+    pipe = registry.get("local_pipeline")
+    tokenizer = pipe.tokenizer
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    batch_ids = [encode(tokenizer, prompt) for prompt in prompts]
+    past_key_values = cached_prefix(pipe, batch_ids[0]) if len(batch_ids) == 1 else None
+    inputs = tokenizer.pad({"input_ids": batch_ids}, return_tensors="pt").to(
+        pipe.model.device
+    )
+
+    with torch.no_grad():
+        outputs = run_generate(
+            pipe.model,
+            inputs["input_ids"],
+            attention_mask=inputs["attention_mask"],
+            past_key_values=past_key_values,
+            pad_token_id=tokenizer.pad_token_id,
+            **{**generation_kwargs, **kwargs},
+        )
+
+    new_tokens = outputs[:, inputs["input_ids"].shape[1] :]
+    return [
+        answer.strip()
+        for answer in tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+    ]
+
+
+def stream_batch(requests):
+    """Generate the answers of several `(prompt, pieces, cancel_event)` requests together.
+
+    The pieces of each answer are put on its `pieces` queue as soon as they
+    are decoded, then None. A request whose `cancel_event` is set stops
+    after its current token, the others go on. Returns the full answers.
+    """
+    pipe = registry.get("local_pipeline")
+    stop_ids = pipe.model.generation_config.eos_token_id
+    stop_ids = [stop_ids] if isinstance(stop_ids, int) else list(stop_ids or [])
+    stop_ids += [pipe.tokenizer.eos_token_id, pipe.tokenizer.pad_token_id]
+    streamer = BatchStreamer(
+        pipe.tokenizer,
+        [pieces for _, pieces, _ in requests],
+        [token_id for token_id in stop_ids if token_id is not None],
+    )
+    try:
+        return generate_batch(
+            [prompt for prompt, _, _ in requests],
+            streamer=streamer,
+            stopping_criteria=cancel_criteria(
+                [cancel_event for _, _, cancel_event in requests]
+            ),
         )
+    finally:
+        # Unblock every reader, also when the batch failed
+        streamer.end()
+
+
+registry.register("local_batch_scheduler", lambda: BatchScheduler(stream_batch))
+
+
+def scheduled_stream(prompt, cancel_event):
+    """Yield the answer to `prompt` as the scheduler generates it in a batch."""
+    pieces = queue.Queue()
+    future = registry.get("local_batch_scheduler").submit(
+        (prompt, pieces, cancel_event)
+    )
+    finished = False
+    try:
+        while True:
+            piece = pieces.get()
+            if piece is None:
+                break
+            yield piece
+        finished = True
+    finally:
+        if not finished:
+            # Still queued, it is dropped; already generating, its row stops
+            future.cancel()
+            cancel_event.set()
+    # Raises the error of the batch, if any
+    future.result()
+
+
+def local_llm_question(user_input, get_context_retrieval):
+    answer = "".join(local_llm_stream(user_input, get_context_retrieval)).strip()
+
+    if config.LOG_LEVEL == "DEBUG":
         logger.debug(f"LLM answer:\n{answer}\n")
 
     return answer
@@ -107,8 +401,11 @@ if __name__ == "__main__":
         if user_input.lower() in {"exit", "quit"}:
             print("👋 Goodbye! Stay curious about Griffith College.")
             break
-        answer = local_llm_question(user_input, get_context_retrieval)
-        print("\n📚 GriffithBot:", answer)
+        # Print the answer as it is generated
+        print("\n📚 GriffithBot: ", end="", flush=True)
+        for piece in local_llm_stream(user_input, get_context_retrieval):
+            print(piece, end="", flush=True)
+        print()
         print(
             "Griffith HistoryBot is ready. Ask about the campus' history! Type 'exit' to quit."
         )
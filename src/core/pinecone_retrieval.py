@@ -1,25 +1,46 @@
-from pinecone import Pinecone
 import time
 import logging
 import src.config as config
+from src.core.backends import registry
 import os
 
 # Setup logging
 config.setup_logging()
 logger = logging.getLogger(__name__)
 
-# Initialize Pinecone client and index
-pc = Pinecone(api_key=config.PINECONE_API_KEY)
-dense_index = pc.Index(config.PINECONE_INDEX_NAME)
-image_index = pc.Index(config.PINECONE_IMAGE_INDEX_NAME)
 
+def load_client():
+    from pinecone import Pinecone
 
-def get_context_retrieval(query, top_k=10):
+    # Initialize Pinecone client
+    return Pinecone(api_key=config.PINECONE_API_KEY)
+
+
+# Pinecone client and indexes, created on the first search
+registry.register("pinecone", load_client)
+registry.register(
+    "pinecone_index",
+    lambda: registry.get("pinecone").Index(config.PINECONE_INDEX_NAME),
+)
+registry.register(
+    "pinecone_image_index",
+    lambda: registry.get("pinecone").Index(config.PINECONE_IMAGE_INDEX_NAME),
+)
+
+
+def get_context_retrieval(query, top_k=10, categories=None):
     start_time = time.time()
 
-    reranked_results = dense_index.search(
+    search_query = {"top_k": top_k, "inputs": {"text": query}}
+    if categories:
+        # Only chunks of these categories, using the `category` metadata field
+        if isinstance(categories, str):
+            categories = [categories]
+        search_query["filter"] = {"category": {"$in": list(categories)}}
+
+    reranked_results = registry.get("pinecone_index").search(
         namespace=config.PINECONE_NAMESPACE,
-        query={"top_k": top_k, "inputs": {"text": query}},
+        query=search_query,
         rerank={
             "model": "bge-reranker-v2-m3",
             "top_n": top_k,
@@ -59,7 +80,7 @@ def get_image_context_retrieval(query, top_k=10):
     start_time = time.time()
 
     # Search Pinecone image index with reranking similar to text retrieval
-    reranked_results = image_index.search(
+    reranked_results = registry.get("pinecone_image_index").search(
         namespace=config.PINECONE_NAMESPACE,
         query={"top_k": top_k, "inputs": {"text": query}},
         rerank={
@@ -0,0 +1,87 @@
+import copy
+import logging
+import threading
+from collections import OrderedDict
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def common_prefix(first, second):
+    """Return the longest common start of two token id lists."""
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return list(first[:length])
+
+
+class PrefixKVCache:
+    """KV caches of prompt prefixes, computed once and copied for each question.
+
+    A prompt starting with a cached prefix only needs prefill over the rest
+    of its tokens: `generate` is given the full prompt and a copy of the
+    prefix cache, and skips the positions already in it. Caches are keyed
+    by the prefix token ids, so a changed system prompt (or the date in the
+    Llama chat template) gets its own entry; only the `max_entries` most
+    recent ones are kept. The prefix ids themselves are memoized too, see
+    `prefix_ids`.
+    """
+
+    def __init__(self, model, max_entries=2):
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._caches = OrderedDict()
+        self._prefix_key = None
+        self._prefix_ids = None
+        self._lock = threading.Lock()
+
+    def compute(self, prefix_ids):
+        import torch
+        from transformers import DynamicCache
+
+        input_ids = torch.tensor([prefix_ids], device=self.model.device)
+        with torch.no_grad():
+            outputs = self.model(
+                input_ids=input_ids, past_key_values=DynamicCache(), use_cache=True
+            )
+        return outputs.past_key_values
+
+    def prefix_ids(self, key, compute):
+        """Return the prefix ids of `key`, calling `compute()` only when `key` changes.
+
+        `key` holds whatever the prefix depends on, so the prompt template is
+        not rendered and tokenized again for every question.
+        """
+        with self._lock:
+            if self._prefix_ids is None or self._prefix_key != key:
+                self._prefix_ids = compute()
+                self._prefix_key = key
+            return self._prefix_ids
+
+    def get(self, prefix_ids):
+        """Return a copy of the KV cache of `prefix_ids`, computing it on first use."""
+        key = tuple(prefix_ids)
+        with self._lock:
+            cache = self._caches.get(key)
+            if cache is None:
+                self.misses += 1
+                logger.info(f"Computing the KV cache of a {len(key)} token prefix")
+                cache = self.compute(prefix_ids)
+                self._caches[key] = cache
+                if len(self._caches) > self.max_entries:
+                    self._caches.popitem(last=False)
+            else:
+                self.hits += 1
+                self._caches.move_to_end(key)
+
+            # generate() appends to the cache it is given, keep the original intact
+            return copy.deepcopy(cache)
+
+    def stats(self):
+        return {"size": len(self._caches), "hits": self.hits, "misses": self.misses}
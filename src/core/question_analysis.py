@@ -19,3 +19,8 @@ def is_about_chatbot(question: str) -> bool:
 
     question_lower = question.lower()
     return any(keyword in question_lower for keyword in chatbot_keywords)
+
+
+def normalize_question(question: str) -> str:
+    # Same key for questions that only differ by case or spacing
+    return " ".join(question.lower().split())
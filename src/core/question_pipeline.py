@@ -0,0 +1,91 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import src.config as config
+from src.core.faiss_retrieval import engine
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+# Shared by all questions, image searches of concurrent users queue here
+executor = ThreadPoolExecutor(
+    max_workers=config.PIPELINE_WORKERS, thread_name_prefix="question-pipeline"
+)
+
+
+def answer_question(
+    user_input,
+    stream_answer,
+    on_images,
+    on_piece,
+    cancel_event=None,
+    top_k=5,
+    image_top_k=10,
+):
+    """Answer a question with its stages overlapped, delivering each result when ready.
+
+    The question is embedded once, and the image search submitted to the
+    thread pool right away; `on_images(images)` is called from the pool
+    thread as soon as the images are found. Meanwhile this thread streams
+    the answer from `stream_answer(user_input, get_context_retrieval,
+    cancel_event)` and calls `on_piece(piece)` for each piece. The text
+    search only runs on the first call of `get_context_retrieval`, so a
+    cached answer or a question about the chatbot skips it. Returns once
+    both are done.
+    """
+    start_time = time.time()
+    queries = [user_input]
+    snapshot = engine.snapshot()
+    # Also the embedding the answer cache looks the question up with
+    query_vecs = engine.encode_batch(queries)
+
+    def search_images():
+        try:
+            images = engine.search_images_batch(
+                snapshot, queries, query_vecs, image_top_k
+            )[0]
+        except Exception as e:
+            # The answer does not depend on the images
+            print(f"[Image retrieval failed]: {e}")
+            images = []
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(
+                f"Pipeline images ready after {time.time() - start_time:.3f} seconds"
+            )
+        on_images(images)
+
+    images_future = executor.submit(search_images)
+    retrieval = {}
+
+    def retrieve():
+        # Once per question, even if a failed backend hands over to another
+        if "chunks" not in retrieval:
+            hits_per_query, _ = engine.search_text_batch(
+                snapshot, queries, query_vecs, top_k
+            )
+            retrieval["chunks"] = [hit["chunk_text"] for hit in hits_per_query[0]]
+            if config.LOG_LEVEL == "DEBUG":
+                logger.debug(
+                    f"Pipeline context ready after {time.time() - start_time:.3f} seconds"
+                )
+        return retrieval["chunks"]
+
+    def retrieved_context(query, top_k=top_k):
+        return retrieve()[:top_k], "N/A", "N/A", "N/A"
+
+    try:
+        stream = stream_answer(user_input, retrieved_context, cancel_event)
+        try:
+            for piece in stream:
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                on_piece(piece)
+        finally:
+            # Stops the generation if it was cancelled
+            stream.close()
+    finally:
+        images_future.result()
+
+    if config.LOG_LEVEL == "DEBUG":
+        logger.debug(f"Pipeline done after {time.time() - start_time:.3f} seconds")
@@ -0,0 +1,81 @@
+import time
+import logging
+import threading
+import src.config as config
+from src.core.lru_cache import LRUCache
+from src.core.question_analysis import normalize_question
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Re-scores (question, chunk) pairs with a local cross-encoder on CPU.
+
+    All pairs of a search are scored in one batch, and scores are cached per
+    (normalized question, chunk text) so a repeated question costs nothing.
+    """
+
+    def __init__(
+        self,
+        model_name=config.RERANK_MODEL_NAME,
+        cache_size=config.RERANK_CACHE_SIZE,
+    ):
+        self.model_name = model_name
+        self.score_cache = LRUCache(cache_size)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        # Only load the cross-encoder once reranking is actually used
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                print("Loading reranking model...")
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def rerank_batch(self, queries, hits_per_query, top_n):
+        """Sort the hits of each query by cross-encoder score and keep `top_n`.
+
+        Each hit is a dict with a `chunk_text`, and gets a `rerank_score`.
+        Returns the reranked hits and the number of pairs the model scored
+        for each query (the local equivalent of Pinecone's rerank units).
+        """
+        start_time = time.time()
+
+        keys = [normalize_question(query) for query in queries]
+        pairs = []
+        pair_slots = []
+        for q, (query, key, hits) in enumerate(zip(queries, keys, hits_per_query)):
+            for hit in hits:
+                score = self.score_cache.get((key, hit["chunk_text"]))
+                if score is None:
+                    pairs.append((query, hit["chunk_text"]))
+                    pair_slots.append((q, hit))
+                else:
+                    hit["rerank_score"] = score
+
+        rerank_units = [0] * len(queries)
+        if pairs:
+            scores = self.model.predict(pairs, batch_size=len(pairs))
+            for (q, hit), score in zip(pair_slots, scores):
+                hit["rerank_score"] = float(score)
+                self.score_cache.put((keys[q], hit["chunk_text"]), float(score))
+                rerank_units[q] += 1
+
+        reranked = [
+            sorted(hits, key=lambda hit: hit["rerank_score"], reverse=True)[:top_n]
+            for hits in hits_per_query
+        ]
+
+        if config.LOG_LEVEL == "DEBUG":
+            logger.debug(
+                f"Cross-encoder scored {len(pairs)} pairs in {time.time() - start_time:.3f} seconds"
+            )
+            logger.debug(f"Rerank score cache: {self.score_cache.stats()}")
+
+        return reranked, rerank_units
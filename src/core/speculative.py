@@ -0,0 +1,83 @@
+import logging
+import threading
+from contextlib import contextmanager
+import src.config as config
+
+# Setup logging
+config.setup_logging()
+logger = logging.getLogger(__name__)
+
+
+def load_draft_model(profile=config.LOCAL_PROFILE):
+    """Load the draft model of assisted generation, like the local model is loaded."""
+    import torch
+    from transformers import AutoModelForCausalLM
+    from src.core.cpu_profile import load_cpu_model
+
+    print("Loading draft LLM...")
+    if profile == "cpu":
+        model, _ = load_cpu_model(config.LOCAL_DRAFT_MODEL)
+        return model
+
+    model = AutoModelForCausalLM.from_pretrained(
+        config.LOCAL_DRAFT_MODEL, torch_dtype=torch.bfloat16, device_map="auto"
+    )
+    return model.eval()
+
+
+class DraftAcceptance:
+    """Share of the draft model tokens accepted by the local model.
+
+    In assisted generation each forward pass of the draft model proposes
+    one token, and each forward pass of the local model keeps the proposed
+    tokens it agrees with plus one of its own. `track` counts both passes
+    during a `generate` call, and `record` turns them into accepted tokens.
+    The counts assume nothing else runs the two models at the same time.
+    """
+
+    def __init__(self):
+        self.proposed = 0
+        self.accepted = 0
+        self.generations = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def track(self, model, draft_model):
+        calls = {"model": 0, "draft": 0}
+
+        def counter(name):
+            def hook(module, args, output):
+                calls[name] += 1
+
+            return hook
+
+        handles = [
+            model.register_forward_hook(counter("model")),
+            draft_model.register_forward_hook(counter("draft")),
+        ]
+        try:
+            yield calls
+        finally:
+            for handle in handles:
+                handle.remove()
+
+    def record(self, calls, new_tokens):
+        """Add one generation of `new_tokens` tokens, return its acceptance rate."""
+        accepted = max(new_tokens - calls["model"], 0)
+        with self._lock:
+            self.proposed += calls["draft"]
+            self.accepted += accepted
+            self.generations += 1
+        return accepted / calls["draft"] if calls["draft"] else 0.0
+
+    @property
+    def rate(self):
+        return self.accepted / self.proposed if self.proposed else 0.0
+
+    def stats(self):
+        return {
+            "generations": self.generations,
+            "proposed": self.proposed,
+            "accepted": self.accepted,
+            "rate": round(self.rate, 3),
+        }
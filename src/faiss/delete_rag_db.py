@@ -1,11 +1,44 @@
 import os
+import shutil
 import src.config as config
 
-# Use the path from config
-index_file = config.INDEX_FILE
+# Everything `make faiss-populate` writes. The generation file goes first, so a
+# running app never reloads a half-deleted set of files.
+files = [
+    config.GENERATION_FILE,
+    config.INDEX_FILE,
+    config.TEXT_VECTORS_FILE,
+    config.TEXT_VECTORS_FILE + ".tmp.npy",
+    config.TEXT_MANIFEST_FILE,
+    config.TEXT_MANIFEST_FILE + ".tmp",
+    config.IMAGE_INDEX_FILE,
+    config.IMAGE_VECTORS_FILE,
+    config.IMAGE_VECTORS_FILE + ".tmp.npy",
+    config.IMAGE_MANIFEST_FILE,
+    config.IMAGE_MANIFEST_FILE + ".tmp",
+]
+directories = [
+    config.TEXT_STORE_DIR,
+    config.TEXT_BM25_DIR,
+    config.CATEGORY_INDEX_DIR,
+    config.IMAGE_STORE_DIR,
+    config.IMAGE_BM25_DIR,
+    # Otherwise the next populate run reuses the old chunk embeddings
+    config.EMBEDDING_CACHE_DIR,
+]
 
-if os.path.exists(index_file):
-    os.remove(index_file)
-    print(f"🗑️  Deleted FAISS index file: '{index_file}'")
-else:
-    print(f"❌ File '{index_file}' does not exist.")
+deleted = 0
+for path in files:
+    if os.path.exists(path):
+        os.remove(path)
+        deleted += 1
+        print(f"🗑️  Deleted FAISS file: '{path}'")
+
+for path in directories:
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+        deleted += 1
+        print(f"🗑️  Deleted FAISS directory: '{path}'")
+
+if deleted == 0:
+    print(f"❌ No FAISS files found in '{config.INDEX_DIR}'.")
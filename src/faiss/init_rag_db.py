@@ -1,93 +1,555 @@
 import os
 import json
-import faiss
+import shutil
+import time
+import argparse
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import src.config as config
+from src.core.bm25 import BM25Index
+from src.core.chunk_store import ChunkStore, ChunkStoreWriter, save_array
+from src.core.embedding_cache import ChunkEmbeddingCache, content_hash
+from src.core.faiss_index import (
+    TRAINED_INDEX_TYPES,
+    build_index,
+    read_index,
+    supports_removal,
+    write_index,
+)
 
-# Ensure index directory exists
-os.makedirs(config.INDEX_DIR, exist_ok=True)
-
-# Load records (text)
-with open(config.RECORDS_FILE, "r", encoding="utf-8") as f:
-    records = json.load(f)
-
-print(f"✅ Loaded {len(records)} records from '{config.RECORDS_FILE}'")
-
-# Load image metadata
-with open(config.IMAGE_RECORDS_FILE, "r", encoding="utf-8") as f:
-    image_records = json.load(f)
-
-print(f"🖼️ Loaded {len(image_records)} image records from '{config.IMAGE_RECORDS_FILE}'")
-
-# Initialize embedding model
-print("🔄 Loading embedding model...")
-model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
-
-### TEXT INDEX ###
-# Extract data
-texts = [record["chunk_text"] for record in records]
-original_ids = [record["_id"] for record in records]
-
-# Save FAISS int ID → original string _id
-id_map = {i: original_ids[i] for i in range(len(original_ids))}
-with open(config.ID_MAP_FILE, "w", encoding="utf-8") as f:
-    json.dump(id_map, f, indent=2)
-print(f"🧭 Saved ID mapping to '{config.ID_MAP_FILE}'")
-
-# Save FAISS int ID → full metadata
-text_store = {
-    str(i): {
-        "_id": original_ids[i],
-        "chunk_text": texts[i],
-        "category": records[i].get("category", ""),
-    }
-    for i in range(len(original_ids))
-}
-with open(config.TEXT_STORE_FILE, "w", encoding="utf-8") as f:
-    json.dump(text_store, f, indent=2)
-print(f"📚 Saved text store to '{config.TEXT_STORE_FILE}'")
-
-# Generate embeddings
-print("🧠 Generating embeddings for text records...")
-embeddings = model.encode(texts, show_progress_bar=True)
-embeddings = np.array(embeddings).astype("float32")
-
-# Build and save FAISS index
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
-print(f"✅ FAISS text index populated with {index.ntotal} vectors.")
-faiss.write_index(index, config.INDEX_FILE)
-print(f"💾 FAISS text index saved to '{config.INDEX_FILE}'")
-
-### IMAGE INDEX ###
-image_texts = [record["description"] for record in image_records]
-image_ids = [record["id"] for record in image_records]
-
-# Save FAISS int ID → original image ID
-image_id_map = {i: image_ids[i] for i in range(len(image_ids))}
-with open(config.IMAGE_ID_MAP_FILE, "w", encoding="utf-8") as f:
-    json.dump(image_id_map, f, indent=2)
-print(f"🧭 Saved image ID mapping to '{config.IMAGE_ID_MAP_FILE}'")
-
-# Save image metadata
-image_store = {
-    str(i): {"id": image_ids[i], "description": image_texts[i]}
-    for i in range(len(image_ids))
-}
-with open(config.IMAGE_STORE_FILE, "w", encoding="utf-8") as f:
-    json.dump(image_store, f, indent=2)
-print(f"🖼️ Saved image store to '{config.IMAGE_STORE_FILE}'")
-
-# Generate image embeddings
-print("🧠 Generating embeddings for image records...")
-image_embeddings = model.encode(image_texts, show_progress_bar=True)
-image_embeddings = np.array(image_embeddings).astype("float32")
-
-# Build and save image FAISS index
-image_index = faiss.IndexFlatL2(image_embeddings.shape[1])
-image_index.add(image_embeddings)
-print(f"✅ FAISS image index populated with {image_index.ntotal} vectors.")
-faiss.write_index(image_index, config.IMAGE_INDEX_FILE)
-print(f"💾 FAISS image index saved to '{config.IMAGE_INDEX_FILE}'")
+
+def iter_json_array(path, read_size=1 << 20):
+    """Yield the items of a JSON array file one at a time.
+
+    The file is read in blocks of `read_size` characters and each item is
+    decoded as soon as it is complete, so only one block is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        started = False
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"'{path}' does not hold a JSON array")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    item, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Item cut by the end of the block, read more
+                    if eof:
+                        raise
+                else:
+                    yield item
+                    continue
+            elif eof:
+                raise ValueError(f"'{path}' ends before its JSON array is closed")
+
+            block = f.read(read_size)
+            eof = not block
+            buffer = buffer[pos:] + block
+            pos = 0
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def write_manifest(manifest_file, index_type, dimension, next_id, records):
+    with open(manifest_file + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "model": config.EMBEDDING_MODEL_NAME,
+                "index_type": index_type,
+                "dimension": dimension,
+                "next_id": next_id,
+                "records": records,
+            },
+            f,
+        )
+    os.replace(manifest_file + ".tmp", manifest_file)
+
+
+def write_category_indexes(directory, index_type, store_dir, vectors_file, ids):
+    """Write one text index per chunk category, for category-filtered searches.
+
+    Built one category at a time from the stored float16 vectors of the
+    live `ids`. Removes the directory when FAISS_CATEGORY_INDEXES is off, so
+    a later run does not search stale indexes.
+    """
+    if not config.FAISS_CATEGORY_INDEXES:
+        shutil.rmtree(directory, ignore_errors=True)
+        return
+
+    os.makedirs(directory, exist_ok=True)
+    store = ChunkStore(store_dir)
+    vectors = np.load(vectors_file, mmap_mode="r")
+    names = []
+    for name in store.category_names:
+        category_ids = np.intersect1d(store.category_ids([name]), ids)
+        if not len(category_ids):
+            continue
+        index = build_index(
+            np.asarray(vectors[category_ids], dtype="float32"),
+            index_type,
+            ids=category_ids,
+        )
+        write_index(index, os.path.join(directory, f"{len(names)}.faiss"))
+        names.append(name)
+        print(f"🗂️ FAISS '{name}' category index populated with {index.ntotal} vectors")
+
+    # Written last, the app only loads the indexes it lists
+    with open(os.path.join(directory, "names.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump(names, f)
+    os.replace(
+        os.path.join(directory, "names.json.tmp"), os.path.join(directory, "names.json")
+    )
+
+
+def load_manifest(manifest_file, index_file, index_type, dimension):
+    """Return the manifest of the previous build, if it can be updated in place.
+
+    The manifest maps each record key to its FAISS id and content hash. A
+    build from another model, index type or vector dimension is rebuilt.
+    """
+    if not (os.path.exists(manifest_file) and os.path.exists(index_file)):
+        return None
+    with open(manifest_file, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if (
+        manifest.get("model") != config.EMBEDDING_MODEL_NAME
+        or manifest.get("index_type") != index_type
+        or manifest.get("dimension") != dimension
+    ):
+        return None
+    return manifest
+
+
+def assign_ids(keys, hashes, manifest):
+    """Give unchanged and edited records their previous FAISS id, new ones a fresh id.
+
+    Returns the id of each record, the ids to remove from the index (edited
+    or deleted records), the ids to add (edited or new records), and the
+    next free id.
+    """
+    previous = manifest["records"] if manifest else {}
+    next_id = manifest["next_id"] if manifest else 0
+
+    ids = []
+    to_remove = []
+    to_add = []
+    seen = set()
+    for key, content in zip(keys, hashes):
+        if key in previous and key not in seen:
+            faiss_id, previous_content = previous[key]
+            if previous_content != content:
+                to_remove.append(faiss_id)
+                to_add.append(faiss_id)
+        else:
+            faiss_id = next_id
+            next_id += 1
+            to_add.append(faiss_id)
+        seen.add(key)
+        ids.append(faiss_id)
+
+    to_remove.extend(
+        faiss_id for key, (faiss_id, _) in previous.items() if key not in seen
+    )
+    return np.array(ids, dtype="int64"), to_remove, to_add, next_id
+
+
+def build_or_update(
+    name,
+    keys,
+    texts,
+    categories,
+    embedding_cache,
+    model,
+    index_type,
+    index_file,
+    store_dir,
+    bm25_dir,
+    vectors_file,
+    manifest_file,
+    category_index_dir=None,
+    full=False,
+):
+    """Write the index, stores and manifest of one corpus (text or image).
+
+    Only new or edited texts go through the encoder. When the previous build
+    is compatible and its index supports removal, only the edited vectors
+    are removed and added again; otherwise the index is rebuilt from the
+    cached embeddings. With `category_index_dir`, per-category indexes are
+    rebuilt too (see `write_category_indexes`).
+    """
+    hashes = embedding_cache.hashes(texts)
+    dimension = model.get_sentence_embedding_dimension()
+    manifest = (
+        None
+        if full
+        else load_manifest(manifest_file, index_file, index_type, dimension)
+    )
+    ids, to_remove, to_add, next_id = assign_ids(keys, hashes, manifest)
+
+    # Generate embeddings, only for texts missing from the cache
+    encoded_before = embedding_cache.encoded
+    print(f"🧠 Generating embeddings for {name} records...")
+    embeddings = embedding_cache.embed(
+        texts, lambda batch: model.encode(batch, show_progress_bar=True)
+    )
+    print(
+        f"🧠 Encoded {embedding_cache.encoded - encoded_before} new or edited {name} "
+        f"chunks, {len(texts) - (embedding_cache.encoded - encoded_before)} from cache"
+    )
+
+    # Stores are indexed by FAISS id, ids of deleted records stay empty
+    stored_keys = [""] * next_id
+    stored_texts = [""] * next_id
+    stored_categories = [""] * next_id
+    vectors = np.zeros((next_id, embeddings.shape[1]), dtype="float16")
+    for faiss_id, key, text, category, embedding in zip(
+        ids, keys, texts, categories, embeddings
+    ):
+        stored_keys[faiss_id] = key
+        stored_texts[faiss_id] = text
+        stored_categories[faiss_id] = category
+        vectors[faiss_id] = embedding
+
+    # Save FAISS int ID → record id, text and category
+    ChunkStore.write(store_dir, stored_keys, stored_texts, stored_categories)
+    print(f"📚 Saved {name} store to '{store_dir}'")
+
+    # Save keyword index over the texts
+    BM25Index.write(bm25_dir, stored_texts)
+    print(f"🔎 Saved BM25 {name} index to '{bm25_dir}'")
+
+    # Save float16 copy of the vectors, for re-scoring and exact distances
+    save_array(vectors_file, vectors)
+    print(f"📐 Saved {name} vectors to '{vectors_file}'")
+
+    index = None
+    if manifest is not None:
+        index = read_index(index_file, mmap=False)
+        if index.d == dimension and supports_removal(index):
+            if to_remove:
+                index.remove_ids(np.array(to_remove, dtype="int64"))
+            if to_add:
+                rows = np.isin(ids, to_add)
+                index.add_with_ids(embeddings[rows], ids[rows])
+            print(
+                f"♻️ FAISS {index_type} {name} index updated: "
+                f"{len(to_remove)} removed, {len(to_add)} added"
+            )
+        else:
+            index = None
+
+    if index is None:
+        # Build and save FAISS index
+        index = build_index(embeddings, index_type, ids=ids)
+        print(
+            f"✅ FAISS {index_type} {name} index populated with {index.ntotal} vectors."
+        )
+
+    write_index(index, index_file)
+    print(
+        f"💾 FAISS {name} index saved to '{index_file}' "
+        f"({os.path.getsize(index_file) / 1e6:.2f} MB)"
+    )
+
+    if category_index_dir:
+        write_category_indexes(
+            category_index_dir, index_type, store_dir, vectors_file, ids
+        )
+
+    write_manifest(
+        manifest_file,
+        index_type,
+        dimension,
+        next_id,
+        {
+            key: [int(faiss_id), content]
+            for key, faiss_id, content in zip(keys, ids, hashes)
+        },
+    )
+
+    return set(hashes)
+
+
+def stream_build(
+    name,
+    records_file,
+    fields,
+    model,
+    pool,
+    index_type,
+    index_file,
+    store_dir,
+    bm25_dir,
+    vectors_file,
+    manifest_file,
+    category_index_dir=None,
+):
+    """Build the index, stores and manifest of one corpus while reading its records.
+
+    Records are read one at a time from `records_file`, `fields(record)`
+    giving their key, text and category, and encoded by the process `pool`
+    in batches of INGEST_BATCH_SIZE. Each batch is written to the stores and
+    added to the index before the next one is read, so memory is bounded by
+    the batch size, except for the training sample of IVF / SQ8 indexes,
+    the keyword postings and the manifest. Always a full rebuild, and the
+    embedding cache is left untouched.
+    """
+    start_time = time.perf_counter()
+    num_records = sum(1 for _ in iter_json_array(records_file))
+    if num_records == 0:
+        raise ValueError(f"No {name} records in '{records_file}'")
+    print(f"✅ Found {num_records} {name} records in '{records_file}'")
+
+    # float16 copy of the vectors, filled batch by batch
+    vectors = np.lib.format.open_memmap(
+        vectors_file + ".tmp.npy",
+        mode="w+",
+        dtype="float16",
+        shape=(num_records, model.get_sentence_embedding_dimension()),
+    )
+    store = ChunkStoreWriter(store_dir)
+    records = {}
+
+    # Trained index types wait for a training sample before the first add
+    index = None
+    pending = []
+    min_pending = (
+        config.FAISS_TRAIN_SAMPLE_SIZE if index_type in TRAINED_INDEX_TYPES else 1
+    )
+
+    encode_time = 0.0
+    for batch in batched(iter_json_array(records_file), config.INGEST_BATCH_SIZE):
+        keys, texts, categories = zip(*(fields(record) for record in batch))
+
+        encode_start = time.perf_counter()
+        embeddings = np.asarray(
+            model.encode_multi_process(list(texts), pool), dtype="float32"
+        )
+        encode_time += time.perf_counter() - encode_start
+
+        first_id = len(store)
+        ids = np.arange(first_id, first_id + len(batch), dtype="int64")
+        for faiss_id, key, text, category in zip(ids, keys, texts, categories):
+            store.append(key, text, category)
+            records[key] = [
+                int(faiss_id),
+                content_hash(config.EMBEDDING_MODEL_NAME, text),
+            ]
+        vectors[first_id : first_id + len(batch)] = embeddings
+
+        if index is not None:
+            index.add_with_ids(embeddings, ids)
+        else:
+            pending.append((embeddings, ids))
+            if sum(len(ids) for _, ids in pending) >= min_pending:
+                index = build_index(
+                    np.vstack([embeddings for embeddings, _ in pending]),
+                    index_type,
+                    ids=np.concatenate([ids for _, ids in pending]),
+                )
+                pending = []
+        print(f"   {len(store)}/{num_records} {name} chunks indexed")
+
+    if index is None:
+        # Fewer records than the training sample
+        index = build_index(
+            np.vstack([embeddings for embeddings, _ in pending]),
+            index_type,
+            ids=np.concatenate([ids for _, ids in pending]),
+        )
+
+    vectors.flush()
+    del vectors
+    os.replace(vectors_file + ".tmp.npy", vectors_file)
+    print(f"📐 Saved {name} vectors to '{vectors_file}'")
+
+    store.close()
+    print(f"📚 Saved {name} store to '{store_dir}'")
+
+    # Keyword index over the texts, read back from the store
+    texts = ChunkStore(store_dir).texts
+    BM25Index.write(bm25_dir, (texts[i] for i in range(len(texts))))
+    print(f"🔎 Saved BM25 {name} index to '{bm25_dir}'")
+
+    write_index(index, index_file)
+    print(
+        f"💾 FAISS {index_type} {name} index with {index.ntotal} vectors saved to "
+        f"'{index_file}' ({os.path.getsize(index_file) / 1e6:.2f} MB)"
+    )
+
+    if category_index_dir:
+        write_category_indexes(
+            category_index_dir,
+            index_type,
+            store_dir,
+            vectors_file,
+            np.arange(num_records, dtype="int64"),
+        )
+
+    write_manifest(
+        manifest_file,
+        index_type,
+        model.get_sentence_embedding_dimension(),
+        num_records,
+        records,
+    )
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"🚀 {num_records / elapsed:.1f} {name} chunks/s overall, "
+        f"{num_records / max(encode_time, 1e-9):.1f} chunks/s encoding"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or update the FAISS RAG")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="rebuild the indexes from scratch (cached embeddings are still used)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "rebuild the indexes from scratch while reading the records, encoding "
+            "batches on a pool of processes (for corpora too large for memory)"
+        ),
+    )
+    args = parser.parse_args()
+
+    start_time = time.time()
+
+    # Ensure index directory exists
+    os.makedirs(config.INDEX_DIR, exist_ok=True)
+
+    if args.stream:
+        print("🔄 Loading embedding model...")
+        model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+        pool = model.start_multi_process_pool(
+            ["cpu"] * config.INGEST_WORKERS if config.INGEST_WORKERS else None
+        )
+        try:
+            stream_build(
+                "text",
+                config.RECORDS_FILE,
+                lambda record: (
+                    record["_id"],
+                    record["chunk_text"],
+                    record.get("category", ""),
+                ),
+                model,
+                pool,
+                config.FAISS_INDEX_TYPE,
+                config.INDEX_FILE,
+                config.TEXT_STORE_DIR,
+                config.TEXT_BM25_DIR,
+                config.TEXT_VECTORS_FILE,
+                config.TEXT_MANIFEST_FILE,
+                config.CATEGORY_INDEX_DIR,
+            )
+            stream_build(
+                "image",
+                config.IMAGE_RECORDS_FILE,
+                lambda record: (record["id"], record["description"], ""),
+                model,
+                pool,
+                config.FAISS_IMAGE_INDEX_TYPE,
+                config.IMAGE_INDEX_FILE,
+                config.IMAGE_STORE_DIR,
+                config.IMAGE_BM25_DIR,
+                config.IMAGE_VECTORS_FILE,
+                config.IMAGE_MANIFEST_FILE,
+            )
+        finally:
+            model.stop_multi_process_pool(pool)
+    else:
+        # Load records (text)
+        with open(config.RECORDS_FILE, "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+        print(f"✅ Loaded {len(records)} records from '{config.RECORDS_FILE}'")
+
+        # Load image metadata
+        with open(config.IMAGE_RECORDS_FILE, "r", encoding="utf-8") as f:
+            image_records = json.load(f)
+
+        print(
+            f"🖼️ Loaded {len(image_records)} image records from '{config.IMAGE_RECORDS_FILE}'"
+        )
+
+        # Initialize embedding model
+        print("🔄 Loading embedding model...")
+        model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+        embedding_cache = ChunkEmbeddingCache(
+            config.EMBEDDING_CACHE_DIR,
+            config.EMBEDDING_MODEL_NAME,
+            model.get_sentence_embedding_dimension(),
+        )
+        print(f"🗃️ Embedding cache holds {len(embedding_cache)} chunks")
+
+        ### TEXT INDEX ###
+        text_hashes = build_or_update(
+            "text",
+            [record["_id"] for record in records],
+            [record["chunk_text"] for record in records],
+            [record.get("category", "") for record in records],
+            embedding_cache,
+            model,
+            config.FAISS_INDEX_TYPE,
+            config.INDEX_FILE,
+            config.TEXT_STORE_DIR,
+            config.TEXT_BM25_DIR,
+            config.TEXT_VECTORS_FILE,
+            config.TEXT_MANIFEST_FILE,
+            config.CATEGORY_INDEX_DIR,
+            full=args.full,
+        )
+
+        ### IMAGE INDEX ###
+        image_hashes = build_or_update(
+            "image",
+            [record["id"] for record in image_records],
+            [record["description"] for record in image_records],
+            [""] * len(image_records),
+            embedding_cache,
+            model,
+            config.FAISS_IMAGE_INDEX_TYPE,
+            config.IMAGE_INDEX_FILE,
+            config.IMAGE_STORE_DIR,
+            config.IMAGE_BM25_DIR,
+            config.IMAGE_VECTORS_FILE,
+            config.IMAGE_MANIFEST_FILE,
+            full=args.full,
+        )
+
+        # Keep only the embeddings of chunks still in the corpus
+        embedding_cache.save(keep=text_hashes | image_hashes)
+        print(f"🗃️ Saved embedding cache to '{config.EMBEDDING_CACHE_DIR}'")
+
+    # Mark the rebuild as complete, running apps reload on the new generation
+    with open(config.GENERATION_FILE, "w", encoding="utf-8") as f:
+        f.write(str(time.time_ns()))
+    print(f"🔁 Saved index generation to '{config.GENERATION_FILE}'")
+    print(f"⏱️ Done in {time.time() - start_time:.1f} seconds")